@@ -0,0 +1,733 @@
+"""An asyncio counterpart of mwapi for connecting to MediaWiki API.
+
+This module contains a class mirroring MwApi with coroutines, so that
+many requests to the API endpoint can be kept in flight at once. All
+requests share one connection pool and are bounded by a configurable
+concurrency limit. Failed requests are retried with the same RetryPolicy
+as MwApi. Paginated lists are available as async iterators.
+
+The module is a library only: it is not linked into the task directories,
+and needs aiohttp, which their requirements do not include. Install it
+from tests/requirements.txt to use it or run its tests.
+
+  Typical usage example:
+
+  async with AsyncMwApi("https://test.wikipedia.org/w/api.php") as api:
+      await api.login("botusername", "botpassword")
+      contents = await asyncio.gather(*(api.get_content(t) for t in titles))
+"""
+
+import ast
+import asyncio
+import re
+import sys
+import time
+from typing import Any, AsyncIterator, Callable, Optional, cast
+
+import aiohttp
+
+from mwapi import (
+    APIDict,
+    APIError,
+    FileDescriptorOrPath,
+    LoginError,
+    MwApi,
+    PageNameError,
+    PageNotFoundError,
+    RetryPolicy,
+    loads,
+)
+
+
+class AsyncMwApi:
+    """An asyncio class for connecting to MediaWiki API."""
+
+    url = None
+    lgtoken = None
+    token = None
+    bot = False
+    highlimits = False
+
+    @staticmethod
+    def __join_param(names: str | list[str], params: APIDict) -> None:
+        """Join a list of parameters into a string separated by |."""
+        if isinstance(names, str):
+            names = [names]
+
+        for name in names:
+            if name in params and isinstance(params[name], list):
+                params[name] = "|".join(map(str, params[name]))
+
+    @staticmethod
+    def __check_page(page: Optional[str], pageid: Optional[int]) -> None:
+        """Check if page or pageid is specified."""
+        if page is None and pageid is None:
+            raise TypeError("No page or pageid specified")
+
+        if page is not None and pageid is not None:
+            raise APIError("Both page and pageid specified", "invalidparammix")
+
+    @staticmethod
+    def __merge_page(target: APIDict, page: APIDict) -> None:
+        """Merge a partial page object from a continued query into another."""
+        for key, value in page.items():
+            if isinstance(value, list) and isinstance(target.get(key), list):
+                target[key].extend(value)
+            else:
+                target[key] = value
+
+    @staticmethod
+    def __encode(params: APIDict) -> dict[str, str]:
+        """Encode parameters, leaving out unset values and false booleans."""
+        ret = {}
+        for key, value in params.items():
+            if value is None or value is False:
+                continue
+            ret[key] = "1" if value is True else str(value)
+        return ret
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        proxies: Optional[str | dict[str, str]] = None,
+        *,
+        concurrency: int = 8,
+        retry: Optional[RetryPolicy] = None,
+        decoder: Callable[[bytes], Any] = loads
+    ) -> None:
+        # Define API endpoint
+        self.url = url
+        if isinstance(proxies, str):
+            proxies = {
+                "http": proxies,
+                "https": proxies,
+            }
+        self.proxies = proxies or {}
+        self.concurrency = concurrency
+        self.retry = retry or RetryPolicy()
+        self.decoder = decoder
+        self.__semaphore = asyncio.Semaphore(concurrency)
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.__credentials: Optional[tuple[str, str]] = None
+
+    async def __aenter__(self) -> "AsyncMwApi":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    @property
+    def __client(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use."""
+        if self.__session is None:
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+        return self.__session
+
+    async def __request(
+        self, method: str, params: APIDict, timeout: Optional[int | float]
+    ) -> APIDict:
+        """Send a request to the API endpoint, retrying as the policy allows."""
+        if not self.url:
+            raise TypeError("No API endpoint specified")
+
+        params.update({"format": "json"})
+        if self.retry.maxlag is not None:
+            params.setdefault("maxlag", self.retry.maxlag)
+        data = self.__encode(params)
+        proxy = self.proxies.get(self.url.split(":", 1)[0])
+        kwargs: APIDict = {"params": data} if method == "GET" else {"data": data}
+
+        attempt = 0
+        while True:
+            delay = None
+            try:
+                async with self.__semaphore:
+                    async with self.__client.request(
+                        method,
+                        self.url,
+                        proxy=proxy,
+                        timeout=aiohttp.ClientTimeout(total=timeout),
+                        **kwargs,
+                    ) as rsp:
+                        if method == "POST":
+                            retryable = (
+                                rsp.status in self.retry.post_statuses
+                                and "Retry-After" in rsp.headers
+                            )
+                        else:
+                            retryable = rsp.status in self.retry.statuses
+                        if retryable and self.retry.should_retry(attempt):
+                            delay = self.retry.delay(
+                                attempt, self.retry.hint(rsp.headers)
+                            )
+                        elif rsp.status >= 400:
+                            print(await rsp.text(), file=sys.stderr)
+                            rsp.raise_for_status()
+                        else:
+                            res = cast(APIDict, self.decoder(await rsp.read()))
+                            code = res.get("error", {}).get("code")
+                            if code not in self.retry.codes:
+                                return res
+                            if not self.retry.should_retry(attempt):
+                                raise APIError(res["error"]["info"], code)
+                            delay = self.retry.delay(
+                                attempt, self.retry.hint(rsp.headers, res)
+                            )
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                # Only a POST that never reached the server is safe to send again
+                unsent = isinstance(e, aiohttp.ConnectionTimeoutError)
+                if method == "POST" and not unsent:
+                    raise
+                if not self.retry.should_retry(attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+
+            # Sleep outside the semaphore so waiting does not block others
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def post(
+        self, params: APIDict, timeout: Optional[int | float] = None
+    ) -> APIDict:
+        """Send a POST request to the API endpoint."""
+        return await self.__request("POST", params, timeout)
+
+    async def get(
+        self, params: APIDict, timeout: Optional[int | float] = None
+    ) -> APIDict:
+        """Send a GET request to the API endpoint."""
+        return await self.__request("GET", params, timeout)
+
+    async def query(self, params: APIDict) -> APIDict:
+        """Send a query request to the API endpoint."""
+        params.update({"action": "query"})
+        return await self.get(params)
+
+    async def get_content(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        redirects: bool = True
+    ) -> Optional[str]:
+        """Get the content of a page."""
+        self.__check_page(page, pageid)
+
+        params = {
+            "prop": "revisions",
+            "titles": page,
+            "pageids": pageid,
+            "rvprop": "content",
+            "rvslots": "*",
+            "redirects": redirects,
+            "converttitles": 1,
+        }
+        res = await self.query(params)
+        res = list(res["query"]["pages"].values())[0]
+        if "revisions" in res:
+            return MwApi.page_content(res)
+        if "missing" in res:
+            raise PageNotFoundError(page or pageid)
+        if "invalid" in res:
+            raise PageNameError(page or pageid)
+        return None
+
+    @property
+    def batch_size(self) -> int:
+        """Maximum number of titles or pageids allowed in one request."""
+        return 500 if self.highlimits else 50
+
+    async def iter_generator(
+        self, generator: str, *, prop: str | list[str] = "revisions", **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over the pages of a generator query, with their props."""
+        params: APIDict = {"generator": generator, "prop": prop}
+        if "revisions" in prop:
+            params.update({"rvprop": "ids|timestamp|content", "rvslots": "*"})
+        prefix = MwApi.GENERATOR_PREFIXES.get(generator)
+        if prefix is not None:
+            params["g" + prefix + "limit"] = self.batch_size
+        params.update(kwargs)
+        self.__join_param([k for k, v in params.items() if isinstance(v, list)], params)
+
+        pages: APIDict = {}
+        async for res in self.__iter_responses(params):
+            for pageid, page in res.get("query", {}).get("pages", {}).items():
+                self.__merge_page(pages.setdefault(pageid, {}), page)
+
+            # Keys without the generator prefix continue props of this batch
+            cont = res.get("continue", {})
+            if any(key[0] != "g" and key != "continue" for key in cont):
+                continue
+            for page in sorted(pages.values(), key=lambda p: p.get("index", 0)):
+                yield page
+            pages = {}
+
+    async def __iter_responses(
+        self, params: APIDict, recursive: bool = True
+    ) -> AsyncIterator[APIDict]:
+        """Send a query request, following continuation, and yield each response."""
+        base = dict(params)
+        while True:
+            res = await self.query(params)
+            yield res
+            if not recursive or "continue" not in res:
+                break
+            params = {**base, **res["continue"]}
+
+    async def iter_contribs(
+        self,
+        username: Optional[str] = None,
+        start: Optional[str | int] = None,
+        end: Optional[str | int] = None,
+        *,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over contributions of a user."""
+        userid = kwargs.get("userid")
+        userprefix = kwargs.get("userprefix")
+        if username is None and userid is None and userprefix is None:
+            # No username, userid or userprefix specified
+            raise TypeError("No username, userid or userprefix specified")
+
+        params: APIDict = {"uclimit": "max"}
+        params.update(kwargs)
+        params.update(
+            {"list": "usercontribs", "ucuser": username, "ucstart": start, "ucend": end}
+        )
+        async for res in self.__iter_responses(params, recursive):
+            for item in res["query"]["usercontribs"]:
+                yield item
+
+    async def list_contribs(
+        self,
+        username: Optional[str] = None,
+        start: Optional[str | int] = None,
+        end: Optional[str | int] = None,
+        *,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> list[APIDict]:
+        """Get a list of contributions of a user."""
+        return [
+            item
+            async for item in self.iter_contribs(
+                username, start, end, recursive=recursive, **kwargs
+            )
+        ]
+
+    async def iter_category_members(
+        self,
+        category: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over pages in a category."""
+        self.__check_page(category, pageid)
+
+        if category is not None:
+            category = (
+                category
+                if re.match(r"^\[\[(?:Category|分[类類]|cat)\:", category, re.I)
+                else "Category:" + category
+            )
+
+        params: APIDict = {"cmlimit": "max"}
+        params.update(kwargs)
+        params.update(
+            {"list": "categorymembers", "cmtitle": category, "cmpageid": pageid}
+        )
+        self.__join_param(["cmprop", "cmnamespace", "cmtype"], params)
+        async for res in self.__iter_responses(params, recursive):
+            for item in res["query"]["categorymembers"]:
+                yield item
+
+    async def list_category_members(
+        self,
+        category: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> list[APIDict]:
+        """Get a list of pages in a category."""
+        return [
+            item
+            async for item in self.iter_category_members(
+                category, pageid=pageid, recursive=recursive, **kwargs
+            )
+        ]
+
+    async def iter_search(
+        self, query: str, *, recursive: bool = True, **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over search results."""
+        params = {"srlimit": "max"}
+        params.update(kwargs)
+        params.update({"list": "search", "srsearch": query})
+        self.__join_param(["srnamespace", "srinfo", "srprop"], params)
+        async for res in self.__iter_responses(params, recursive):
+            for item in res["query"]["search"]:
+                yield item
+
+    async def search(
+        self, query: str, *, recursive: bool = True, **kwargs: Any
+    ) -> list[APIDict]:
+        """Search for pages."""
+        return [
+            item
+            async for item in self.iter_search(query, recursive=recursive, **kwargs)
+        ]
+
+    async def iter_what_links_here(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over pages that link to a page."""
+        self.__check_page(page, pageid)
+
+        params: APIDict = {"bllimit": "max"}
+        params.update(kwargs)
+        params.update({"list": "backlinks", "bltitle": page, "blpageid": pageid})
+        self.__join_param("blnamespace", params)
+        async for res in self.__iter_responses(params, recursive):
+            for item in res["query"]["backlinks"]:
+                yield item
+
+    async def what_links_here(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> list[APIDict]:
+        """Get a list of pages that link to a page."""
+        return [
+            item
+            async for item in self.iter_what_links_here(
+                page, pageid=pageid, recursive=recursive, **kwargs
+            )
+        ]
+
+    def __file_usage_responses(
+        self,
+        page: Optional[str],
+        pageid: Optional[int],
+        recursive: bool,
+        kwargs: APIDict,
+    ) -> AsyncIterator[APIDict]:
+        """Send fileusage query requests and yield each response."""
+        self.__check_page(page, pageid)
+
+        params: APIDict = {"fulimit": "max"}
+        params.update(kwargs)
+        params.update({"prop": "fileusage", "titles": page, "pageids": pageid})
+        self.__join_param(["fuprop", "funamespace", "fushow"], params)
+        return self.__iter_responses(params, recursive)
+
+    async def iter_file_usage(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> AsyncIterator[APIDict]:
+        """Iterate over pages that use a file."""
+        async for res in self.__file_usage_responses(page, pageid, recursive, kwargs):
+            for item in res["query"]["pages"].values():
+                for usage in item.get("fileusage", []):
+                    yield usage
+
+    async def file_usage(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any
+    ) -> APIDict:
+        """Get the file page objects, with the pages that use each file."""
+        ret: APIDict = {}
+        async for res in self.__file_usage_responses(page, pageid, recursive, kwargs):
+            for key, item in res["query"]["pages"].items():
+                if key not in ret:
+                    ret[key] = item
+                    continue
+                usage = ret[key].setdefault("fileusage", [])
+                usage.extend(item.get("fileusage", []))
+        return ret
+
+    async def login(self, username: str, password: str) -> None:
+        """Login to the wiki."""
+        self.__credentials = (username, password)
+
+        # Get login token
+        params = {"meta": "tokens", "type": "login"}
+        res = await self.query(params)
+        self.lgtoken = res["query"]["tokens"]["logintoken"]
+
+        # POST login request
+        params = {
+            "action": "login",
+            "lgname": username,
+            "lgpassword": password,
+            "lgtoken": self.lgtoken,
+        }
+        res = await self.post(params)
+
+        if res["login"]["result"] != "Success":
+            raise APIError(res["login"]["reason"], res["login"]["reason"])
+
+        # Get CSRF token and bot info
+        await self.__update_user()
+
+    async def __update_user(self) -> bool:
+        """Fetch the CSRF token and bot info, returning whether logged in."""
+        params = {"meta": "tokens|userinfo", "uiprop": "groups|rights"}
+        res = await self.query(params)
+        userinfo = res["query"]["userinfo"]
+        if "anon" in userinfo:
+            self.token = None
+            return False
+        self.token = res["query"]["tokens"]["csrftoken"]
+        self.bot = "bot" in userinfo["groups"]
+        self.highlimits = "apihighlimits" in userinfo["rights"]
+        return True
+
+    async def refresh_token(self) -> None:
+        """Fetch a new CSRF token, logging in again if the session has expired."""
+        if not await self.__update_user():
+            if self.__credentials is None:
+                raise LoginError
+            await self.login(*self.__credentials)
+
+    async def __post_with_token(
+        self, params: APIDict, timeout: Optional[int | float]
+    ) -> APIDict:
+        """Send a POST request with the CSRF token, refreshing it once if needed."""
+        params["token"] = self.token
+        res = await self.post(params, timeout)
+        if res.get("error", {}).get("code") == "badtoken":
+            await self.refresh_token()
+            params["token"] = self.token
+            res = await self.post(params, timeout)
+        return res
+
+    async def connect_with_config(
+        self, path: FileDescriptorOrPath, site: str, login: bool = True
+    ) -> None:
+        """Connect to a wiki using a config file."""
+        with open(path, "r", encoding="utf-8") as config_file:
+            config = ast.literal_eval(config_file.read())
+        self.url = config[site][0]
+        if login:
+            await self.login(config[site][1], config[site][2])
+
+    async def login_with_config(self, path: FileDescriptorOrPath, site: str) -> None:
+        """Login to a wiki using a config file."""
+        await self.connect_with_config(path, site, login=True)
+
+    async def edit(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        suppressAbuseFilter: bool = False,
+        timeout: int | float = 0.5,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Edit a page."""
+        if self.token is None:
+            raise LoginError
+
+        self.__check_page(page, pageid)
+
+        # Retrieve a timestamp for the base revision to prevent edit conflict
+        params: APIDict = {
+            "prop": "revisions",
+            "titles": page,
+            "pageids": pageid,
+            "rvprop": "timestamp",
+            "rvslots": "*",
+        }
+        res = await self.query(params)
+
+        base = list(res["query"]["pages"].values())[0]
+        if "revisions" in base:
+            base = base["revisions"][0]["timestamp"]
+        else:
+            base = None
+
+        params = {"bot": self.bot}
+        params.update(kwargs)
+        params.update(
+            {
+                "action": "edit",
+                "title": page,
+                "pageid": pageid,
+                "basetimestamp": base,
+                "starttimestamp": int(time.time()),
+            }
+        )
+        self.__join_param("tags", params)
+        res = await self.__post_with_token(params, timeout)
+
+        if "error" in res:
+            code = res["error"]["code"]
+            if code == "missingtitle":
+                raise PageNotFoundError(page or pageid)
+            if code == "invalidtitle":
+                raise PageNameError(page or pageid)
+            raise APIError(res["error"]["info"], code)
+
+        if res["edit"]["result"] == "Failure":
+            if res["edit"]["code"] == "abusefilter-warning" and suppressAbuseFilter:
+                return await self.edit(
+                    page,
+                    pageid=pageid,
+                    suppressAbuseFilter=suppressAbuseFilter,
+                    timeout=timeout,
+                    **kwargs,
+                )
+            raise APIError(res["edit"]["info"], res["edit"]["code"])
+        if res["edit"]["result"] == "Success":
+            return cast(APIDict, res["edit"])
+        return None
+
+    async def replace(
+        self,
+        page: Optional[str] = None,
+        text: Optional[str] = None,
+        *,
+        suppressAbuseFilter: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Replace the content of a page."""
+        return await self.edit(
+            page, text=text, suppressAbuseFilter=suppressAbuseFilter, **kwargs
+        )
+
+    async def append(
+        self,
+        page: Optional[str] = None,
+        text: Optional[str] = None,
+        *,
+        suppressAbuseFilter: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Append text to a page."""
+        return await self.edit(
+            page, appendtext=text, suppressAbuseFilter=suppressAbuseFilter, **kwargs
+        )
+
+    async def prepend(
+        self,
+        page: Optional[str] = None,
+        text: Optional[str] = None,
+        *,
+        suppressAbuseFilter: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Prepend text to a page."""
+        return await self.edit(
+            page, prependtext=text, suppressAbuseFilter=suppressAbuseFilter, **kwargs
+        )
+
+    async def add_section(
+        self,
+        page: Optional[str] = None,
+        title: Optional[str] = None,
+        text: Optional[str] = None,
+        *,
+        suppressAbuseFilter: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Add a new section to a page."""
+        return await self.edit(
+            page,
+            section="new",
+            sectiontitle=title,
+            text=text,
+            suppressAbuseFilter=suppressAbuseFilter,
+            **kwargs,
+        )
+
+    async def replace_top(
+        self,
+        page: Optional[str] = None,
+        text: Optional[str] = None,
+        *,
+        suppressAbuseFilter: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Replace the top section of a page."""
+        return await self.edit(
+            page,
+            section=0,
+            text=text,
+            suppressAbuseFilter=suppressAbuseFilter,
+            **kwargs,
+        )
+
+    async def move(
+        self,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        reason: Optional[str] = None,
+        *,
+        beforeid: Optional[int] = None,
+        talk: bool = True,
+        subpages: bool = True,
+        redirect: bool = False,
+        **kwargs: Any
+    ) -> APIDict | None:
+        """Move a page."""
+        if self.token is None:
+            raise LoginError
+
+        self.__check_page(before, beforeid)
+        if after is None:
+            raise TypeError("No page name specified for the destination")
+
+        params = kwargs
+        params.update(
+            {
+                "action": "move",
+                "from": before,
+                "fromid": beforeid,
+                "to": after,
+                "reason": reason,
+                "movetalk": talk,
+                "movesubpages": subpages,
+                "noredirect": (not redirect),
+            }
+        )
+        self.__join_param("tags", params)
+        res = await self.__post_with_token(params, 0.5)
+
+        if "error" in res:
+            code = res["error"]["code"]
+            if code == "missingtitle":
+                raise PageNotFoundError(before or beforeid)
+            if code == "invalidtitle":
+                raise PageNameError(before or beforeid)
+            raise APIError(res["error"]["info"], code)
+        return cast(APIDict, res["move"])
@@ -1,15 +1,14 @@
 """Auto update for Azur Lane equip data."""
 import logging
 import os
-import subprocess
 import sys
-from typing import List, cast
 
+from buildcache import BuildCache, atomic_write
 from dotenv import load_dotenv
+from ghsync import GitHubSync
 from github import Github
-from github.ContentFile import ContentFile
 
-from mwapi import MwApi
+from mwapi import MetricsCollector, MwApi
 
 load_dotenv()
 
@@ -38,75 +37,62 @@ logger.info("Got repo.")
 
 logger.info("Getting latest commit...")
 commit = repo.get_branch("master").commit
-open("commit.txt", "a", encoding="utf-8").close()
-with open("commit.txt", "r+", encoding="utf-8") as f:
-    base = f.read()
-    if base == commit.sha:
-        logger.info("No new commits.")
-        logger.info("Task finished successfully.")
-        sys.exit(0)
-    else:
-        f.seek(0)
-        f.write(commit.sha)
-        f.truncate()
+try:
+    with open("commit.txt", "r", encoding="utf-8") as f:
+        base = f.read()
+except FileNotFoundError:
+    base = ""
+if base == commit.sha:
+    logger.info("No new commits.")
+    logger.info("Task finished successfully.")
+    sys.exit(0)
 logger.info("Got latest commit.")
 
-logger.info("Updating files...")
-NO_CHANGE = True
 
-logger.info("Updating equip file...")
-content = cast(
-    ContentFile, repo.get_contents("zh-CN/sharecfg/equip_data_statistics.lua")
-)
-content = content.decoded_content.decode("utf-8")
-open("ESF/dat/equip_data_statistics.lua", "w", encoding="utf-8").close()
-with open("ESF/dat/equip_data_statistics.lua", "r+", encoding="utf-8") as f:
-    if f.read() != content:
-        NO_CHANGE = False
-        f.seek(0)
-        f.write(content)
-        f.truncate()
-        logger.info("Updated equip file.")
-    else:
-        logger.info("Equip file already up to date.")
+def finish() -> None:
+    """Record the commit as done, once the run has succeeded."""
+    atomic_write("commit.txt", commit.sha.encode("utf-8"))
+    logger.info("Task finished successfully.")
+
 
-logger.info("Updating data files...")
-contents = cast(
-    List[ContentFile], repo.get_contents("zh-CN/sharecfg/equip_data_statistics_sublist")
+logger.info("Updating files...")
+sync = GitHubSync(repo, "ESF/dat")
+changed = sync.sync(
+    commit.sha,
+    [
+        "zh-CN/sharecfg/equip_data_statistics.lua",
+        "zh-CN/sharecfg/equip_data_statistics_sublist",
+    ],
 )
-for content in contents:
-    name = content.name
-    content = content.decoded_content.decode("utf-8")
-    open("ESF/dat/" + name, "w", encoding="utf-8").close()
-    with open("ESF/dat/" + name, "r+", encoding="utf-8") as f:
-        if f.read() != content:
-            f.seek(0)
-            f.write(content)
-            f.truncate()
-            logger.info("Updated %s.", name)
-
-if NO_CHANGE:
-    logger.info("No changes to data files.")
-    logger.info("Task finished successfully.")
-    sys.exit(0)
+for name in changed:
+    logger.info("Updated %s.", name)
+logger.info("Finished updating files.")
+
+build = BuildCache(["ESF/dat/*", "ESF/src/*.lua", "ESF/esf.lua"], "equip_formatted.lua")
+inputs = build.changed()
+# The page is still checked, as an earlier run may have failed to edit it
+if not inputs and os.path.exists(build.output):
+    logger.info("No changes to ESF inputs.")
 else:
-    logger.info("Finished updating files.")
-
-logger.info("Running ESF...")
-p = subprocess.Popen(["/usr/bin/lua", "ESF/esf.lua"])
-p.wait()
-logger.info("Finished running ESF.")
+    logger.info("%d ESF inputs changed.", len(inputs))
+    logger.info("Running ESF...")
+    if build.run(["/usr/bin/lua", "ESF/esf.lua"]):
+        logger.info("Finished running ESF.")
+    else:
+        logger.info("Restored ESF output from cache.")
 
 logger.info("Opening formatted equip file...")
 with open("equip_formatted.lua", "r", encoding="utf-8") as f:
     data = f.read()
     logger.info("Got formatted equip file.")
 
-logger.info("Getting target page...")
+logger.info("Checking target page...")
 api = MwApi()
-api.login_with_config("passwords.py", "zh")
-target = api.get_content("Module:碧蓝航线Equips/data")
-if target != data:
+metrics = MetricsCollector()
+metrics.attach(api)
+metrics.export_at_exit("metrics.json", "metrics.prom")
+api.login_with_config("passwords.py", "zh", "session.json")
+if api.changed_pages({"Module:碧蓝航线Equips/data": data}):
     logger.info("Target page is outdated. Updating target page...")
     api.edit(
         "Module:碧蓝航线Equips/data",
@@ -119,4 +105,4 @@ if target != data:
 else:
     logger.info("Target page is already up to date.")
 
-logger.info("Task finished successfully.")
+finish()
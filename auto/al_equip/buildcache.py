@@ -0,0 +1,141 @@
+"""Rerun a build step only when the content of its inputs changes.
+
+The inputs of a build are hashed into a single digest, and the output
+of each build is cached under the digest of its inputs. A build whose
+digest is already cached is restored from the cache instead of being run
+again. Only the keep most recently used outputs are cached. The hash of
+each input of the last build is kept in a manifest, so the inputs that
+changed can be reported.
+
+  Typical usage example:
+
+  build = BuildCache(["ESF/dat/*", "ESF/src/*.lua"], "equip_formatted.lua")
+  if build.changed():
+      build.run(["/usr/bin/lua", "ESF/esf.lua"])
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write a file through a temporary file, so it is never left half written."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def file_hash(path: str) -> str:
+    """Get the SHA-256 of the content of a file."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BuildCache:
+    """A build step with content-hashed inputs and a cached output."""
+
+    def __init__(
+        self,
+        inputs: list[str],
+        output: str,
+        *,
+        cache: str = "build",
+        manifest: str = "build.json",
+        keep: int = 8,
+    ) -> None:
+        self.inputs = inputs
+        self.output = output
+        self.cache = cache
+        self.manifest = manifest
+        self.keep = keep
+        self.__hashes: Optional[dict[str, str]] = None
+
+    @property
+    def hashes(self) -> dict[str, str]:
+        """The hash of each input file, matched by the input patterns."""
+        if self.__hashes is None:
+            paths = sorted(
+                {p for pattern in self.inputs for p in glob.glob(pattern)}
+                - {self.output}
+            )
+            self.__hashes = {p: file_hash(p) for p in paths if os.path.isfile(p)}
+        return self.__hashes
+
+    @property
+    def digest(self) -> str:
+        """The hash of the whole set of inputs."""
+        h = hashlib.sha256()
+        for path, digest in self.hashes.items():
+            h.update(f"{path}\0{digest}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def __load(self) -> dict[str, str]:
+        """Load the input hashes of the last build."""
+        try:
+            with open(self.manifest, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def changed(self) -> list[str]:
+        """Get the inputs added, changed or removed since the last build."""
+        last = self.__load()
+        return sorted(
+            {p for p, h in self.hashes.items() if last.get(p) != h}
+            | {p for p in last if p not in self.hashes}
+        )
+
+    def __prune(self) -> None:
+        """Remove the least recently used outputs beyond the keep newest."""
+        paths = [
+            os.path.join(self.cache, name)
+            for name in os.listdir(self.cache)
+            if not name.startswith(".tmp-")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.keep :]:
+            os.remove(path)
+
+    def run(self, command: list[str]) -> bool:
+        """Produce the output, running the command unless it is cached.
+
+        Returns whether the command was run.
+        """
+        cached = os.path.join(
+            self.cache, self.digest + os.path.splitext(self.output)[1]
+        )
+        ran = not os.path.exists(cached)
+        if ran:
+            logger.info("Running %s...", " ".join(command))
+            subprocess.run(command, check=True)
+            os.makedirs(self.cache, exist_ok=True)
+            with open(self.output, "rb") as f:
+                atomic_write(cached, f.read())
+        else:
+            logger.info("Using cached output %s.", cached)
+            with open(cached, "rb") as f:
+                data = f.read()
+            current = file_hash(self.output) if os.path.exists(self.output) else None
+            if current != hashlib.sha256(data).hexdigest():
+                atomic_write(self.output, data)
+            # Mark the output as recently used
+            os.utime(cached)
+
+        self.__prune()
+        atomic_write(self.manifest, json.dumps(self.hashes, indent=2).encode("utf-8"))
+        return ran
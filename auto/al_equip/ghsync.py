@@ -0,0 +1,166 @@
+"""Sync files from a GitHub repository by comparing their blob SHAs.
+
+The git trees of the synced directories are fetched once per run and
+each blob SHA is compared with the git blob SHA of the local file. A
+manifest of the synced files is kept to remove those deleted upstream.
+Only changed blobs are downloaded, concurrently. When most files have
+changed, a single archive of the commit is downloaded instead.
+
+  Typical usage example:
+
+  sync = GitHubSync(repo, "ESF/dat")
+  changed = sync.sync(commit.sha, ["zh-CN/sharecfg/equip_data_statistics.lua"])
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional
+
+import requests
+from buildcache import atomic_write
+from github.Repository import Repository
+
+logger = logging.getLogger(__name__)
+
+
+def blob_sha(path: str) -> Optional[str]:
+    """Get the git blob SHA of a local file, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class GitHubSync:
+    """Keep local copies of files and directories of a GitHub repository.
+
+    Files are written to dest under their base name, so the contents of a
+    synced directory are flattened into dest. The SHA of each synced blob
+    is kept in the manifest file. Files are written atomically.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        dest: str,
+        *,
+        manifest: str = "manifest.json",
+        workers: int = 8,
+        archive_ratio: float = 0.5,
+    ) -> None:
+        self.repo = repo
+        self.dest = dest
+        self.manifest = manifest
+        self.workers = workers
+        self.archive_ratio = archive_ratio
+        self.__trees: dict[str, list[Any]] = {}
+
+    def __tree(self, sha: str, path: str) -> list[Any]:
+        """Get the entries of a directory at a commit, one level at a time."""
+        if path in self.__trees:
+            return self.__trees[path]
+        if not path:
+            tree = self.repo.get_git_tree(sha).tree
+        else:
+            parent, _, name = path.rpartition("/")
+            entry = next((e for e in self.__tree(sha, parent) if e.path == name), None)
+            if entry is None or entry.type != "tree":
+                raise FileNotFoundError(path)
+            tree = self.repo.get_git_tree(entry.sha).tree
+        self.__trees[path] = tree
+        return tree
+
+    def __blobs(self, sha: str, paths: Iterable[str]) -> dict[str, tuple[str, str]]:
+        """Map the local name of each file to its path and blob SHA."""
+        blobs = {}
+        for path in paths:
+            parent, _, name = path.rpartition("/")
+            entry = next((e for e in self.__tree(sha, parent) if e.path == name), None)
+            if entry is None:
+                raise FileNotFoundError(path)
+            if entry.type == "blob":
+                blobs[name] = (path, entry.sha)
+                continue
+            for e in self.__tree(sha, path):
+                if e.type == "blob":
+                    blobs[e.path] = (path + "/" + e.path, e.sha)
+        return blobs
+
+    def __download_blob(self, sha: str) -> bytes:
+        """Download a blob by its SHA."""
+        blob = self.repo.get_git_blob(sha)
+        return base64.b64decode(blob.content)
+
+    def __download_archive(self, sha: str, paths: dict[str, str]) -> dict[str, bytes]:
+        """Extract files from an archive of a commit, keyed by their path."""
+        wanted = {path: name for name, path in paths.items()}
+        files = {}
+        url = self.repo.get_archive_link("tarball", sha)
+        with requests.get(url, stream=True, timeout=60) as rsp:
+            rsp.raise_for_status()
+            with tarfile.open(fileobj=rsp.raw, mode="r|gz") as tar:
+                for member in tar:
+                    # Members are prefixed with a directory named after the commit
+                    path = member.name.partition("/")[2]
+                    if member.isfile() and path in wanted:
+                        f = tar.extractfile(member)
+                        if f is not None:
+                            files[path] = f.read()
+        return files
+
+    def sync(self, sha: str, paths: Iterable[str]) -> list[str]:
+        """Sync files and directories at a commit and return the changed names."""
+        try:
+            with open(self.manifest, "r", encoding="utf-8") as f:
+                manifest: dict[str, str] = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+
+        blobs = self.__blobs(sha, paths)
+        # Local files are hashed, so a file changed or lost locally is fixed
+        changed = [
+            name
+            for name, (_, blob) in blobs.items()
+            if blob_sha(os.path.join(self.dest, name)) != blob
+        ]
+        removed = [name for name in manifest if name not in blobs]
+        logger.info(
+            "%d of %d files changed, %d removed.",
+            len(changed),
+            len(blobs),
+            len(removed),
+        )
+
+        os.makedirs(self.dest, exist_ok=True)
+        if changed and len(changed) > self.archive_ratio * len(blobs):
+            logger.info("Downloading archive...")
+            archive = self.__download_archive(
+                sha, {name: blobs[name][0] for name in changed}
+            )
+            contents = {name: archive[blobs[name][0]] for name in changed}
+        else:
+            with ThreadPoolExecutor(self.workers) as pool:
+                downloaded = pool.map(
+                    self.__download_blob, (blobs[name][1] for name in changed)
+                )
+                contents = dict(zip(changed, downloaded))
+
+        for name, content in contents.items():
+            atomic_write(os.path.join(self.dest, name), content)
+            manifest[name] = blobs[name][1]
+        for name in removed:
+            path = os.path.join(self.dest, name)
+            if os.path.exists(path):
+                os.remove(path)
+            del manifest[name]
+
+        atomic_write(
+            self.manifest, json.dumps(manifest, indent=2, sort_keys=True).encode()
+        )
+        return sorted(changed + removed)
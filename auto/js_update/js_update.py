@@ -1,11 +1,19 @@
-"""Update JS files on MGP."""
+"""Update JS files on MGP.
+
+The revision of each page is kept in revisions.json, so only pages edited
+since the last run are downloaded, and the files are only committed when
+a page changed.
+"""
 import ast
+import json
 import logging
+import os
 import subprocess
 import sys
 from pathlib import Path
+from typing import cast
 
-from mwapi import MwApi
+from mwapi import MetricsCollector, MwApi
 
 with open(".control", "r", encoding="utf-8") as f:
     if f.read().strip() == "off":
@@ -32,19 +40,51 @@ logger.info("Got JS list.")
 
 logger.info("Connecting to MGP...")
 api = MwApi()
+metrics = MetricsCollector()
+metrics.attach(api)
+metrics.export_at_exit("metrics.json", "metrics.prom")
 api.connect_with_config("passwords.py", "zh")
 logger.info("Connected to MGP.")
 
+# Revision of each page as last downloaded
+try:
+    with open("revisions.json", "r", encoding="utf-8") as f:
+        revids: dict[str, int] = json.load(f)
+except FileNotFoundError:
+    revids = {}
+
+paths = {page: Path("js/" + page.replace(":", "/")) for page in LIST}
+logger.info("Checking revisions...")
+latest = api.get_revisions(LIST)
+changed = []
 for page in LIST:
-    logger.info("Getting %s...", page)
-    content = api.get_content(page)
-    escaped = page.replace(":", "/")
-    path = Path("js/" + escaped)
-    path.mkdir(parents=True, exist_ok=True)
+    rev = latest[page]
+    if rev is None:
+        logger.warning("%s does not exist.", page)
+    elif rev.revid != revids.get(page) or not paths[page].is_file():
+        changed.append(page)
+logger.info("%d of %d pages changed.", len(changed), len(LIST))
+
+if not changed:
+    logger.info("No changes.")
+    logger.info("Task finished successfully.")
+    sys.exit(0)
+
+for page, snapshot in api.get_pages(changed).items():
+    if snapshot is None:
+        continue
+    logger.info("Updating %s...", page)
+    path = paths[cast(str, page)]
+    path.parent.mkdir(parents=True, exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
-        f.write(str(content))
+        f.write(str(snapshot.text))
+    revids[cast(str, page)] = cast(int, snapshot.revid)
     logger.info("Finished %s.", page)
 
+with open("revisions.json.tmp", "w", encoding="utf-8") as f:
+    json.dump(revids, f, ensure_ascii=False, indent=2)
+os.replace("revisions.json.tmp", "revisions.json")
+
 logger.info("Running bash script...")
 subprocess.call("./js-update.sh", shell=True)
 logger.info("Finished running bash script.")
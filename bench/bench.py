@@ -0,0 +1,245 @@
+"""Benchmark the task scripts against a local fake wiki.
+
+Each workload copies a task script and the modules next to it into a
+scratch directory, writes the passwords.py and config files the script
+reads, and runs it in a subprocess against a FakeWikiServer seeded with
+the requested number of pages, without an edit rate limit. Requests are
+counted by the server, while wall time and peak memory are measured for
+the script process only.
+
+  Typical usage example:
+
+  python bench/bench.py --sizes 1000 10000 --workloads cat_tree cat_replace
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+from fakewiki import FakeWiki, FakeWikiServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NEEDLE = "FAKEWIKI_NEEDLE"
+FILES = "测试文件"
+
+# Run a script and record its peak resident set size. ru_maxrss is not used
+# since the child inherits the high-water mark of the process that forks it.
+RUNNER = """
+import atexit, runpy, sys
+
+
+def peak_memory():
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                kilobytes = int(line.split()[1])
+    with open("peak_memory.txt", "w", encoding="ascii") as f:
+        f.write(str(kilobytes * 1024))
+
+
+atexit.register(peak_memory)
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def write(path: str, content: Any) -> None:
+    """Write a file the way the task scripts expect to read it."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content if isinstance(content, str) else repr(content))
+
+
+def cat_tree(wiki: FakeWiki, workdir: str) -> int:
+    # pylint: disable=unused-argument
+    """Prepare cat_tree; its targets are the categories."""
+    return sum(1 for p in wiki.pages.values() if p.ns == 14)
+
+
+def cat_replace(wiki: FakeWiki, workdir: str) -> int:
+    """Prepare cat_replace; its targets are the files in one category."""
+    config = {"site": "zh", "before": FILES, "after": "替换文件"}
+    write(os.path.join(workdir, "config.py"), config)
+    return len(wiki.members("Category:" + FILES))
+
+
+def fulltext_replace(wiki: FakeWiki, workdir: str) -> int:
+    """Prepare fulltext_replace; its targets are the pages with the needle."""
+    config = {
+        "site": "zh",
+        "before": NEEDLE,
+        "after": "FAKEWIKI_REPLACED",
+        "isRegEx": False,
+        "query": f'insource:"{NEEDLE}"',
+        "namespace": "0|6",
+    }
+    write(os.path.join(workdir, "config.py"), config)
+    return sum(1 for p in wiki.pages.values() if NEEDLE in p.text)
+
+
+def batch_ffd(wiki: FakeWiki, workdir: str) -> int:
+    """Prepare batch_ffd; its targets are all files."""
+    files = [p.title for p in wiki.pages.values() if p.ns == 6]
+    write(os.path.join(workdir, "pages.txt"), "\n".join(files) + "\n")
+    return len(files)
+
+
+def mooncake(wiki: FakeWiki, workdir: str) -> int:
+    # pylint: disable=unused-argument
+    """Prepare mooncake; its targets are the subscribers."""
+    config = {"year": 2026, "month": 9, "foreword": "FakeWiki"}
+    write(os.path.join(workdir, "config.py"), config)
+    page = wiki.get("MGP:萌娘百科月报/月饼/订阅")
+    return len(page.text.splitlines()) if page else 0
+
+
+# Workload name: (script, seeding options by size, preparation)
+WORKLOADS: dict[str, tuple[str, Callable[[int], dict[str, Any]], Callable]] = {
+    "cat_tree": (
+        "manual/cat_tree/cat_tree.py",
+        lambda n: {"categories": max(50, n // 10), "root_id": 176083, "cycle": True},
+        cat_tree,
+    ),
+    "cat_replace": ("manual/cat_replace/cat_replace.py", lambda n: {}, cat_replace),
+    "fulltext_replace": (
+        "manual/fulltext_replace/fulltext_replace.py",
+        lambda n: {},
+        fulltext_replace,
+    ),
+    "batch_ffd": ("manual/batch_ffd/batch_ffd.py", lambda n: {}, batch_ffd),
+    "mooncake": (
+        "manual/mooncake/mooncake.py",
+        lambda n: {"subscribers": max(50, n // 10)},
+        mooncake,
+    ),
+}
+
+# Workloads whose scripts limit their edit rate unless told not to
+RATE_LIMITED = {"cat_replace", "batch_ffd", "mooncake"}
+
+# Workloads that edit none of their targets
+READ_ONLY = {"cat_tree"}
+
+
+def setup(script: str, workdir: str, url: str) -> None:
+    """Copy a task script and its modules, and point it at the fake wiki."""
+    source = os.path.dirname(os.path.join(ROOT, script))
+    for name in os.listdir(source):
+        path = os.path.join(source, name)
+        if name.endswith(".py") and name != "passwords.py" and os.path.exists(path):
+            shutil.copy(path, workdir)
+    sites = {site: [url, "Bot@bot", "password"] for site in ("zh", "cm", "en")}
+    write(os.path.join(workdir, "passwords.py"), sites)
+
+
+def run(name: str, pages: int, args: argparse.Namespace) -> dict[str, Any]:
+    """Run one workload at one size and collect its measurements."""
+    script, options, prepare = WORKLOADS[name]
+    wiki = FakeWiki.seeded(
+        pages,
+        file_category=FILES,
+        needle=NEEDLE,
+        size=args.size,
+        seed=args.seed,
+        **options(pages),
+    )
+    server = FakeWikiServer(
+        wiki,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        stale_search=args.stale_search,
+    )
+    with server, tempfile.TemporaryDirectory() as workdir:
+        setup(script, workdir, server.url)
+        targets = prepare(wiki, workdir)
+        before = dict(server.api.stats)
+
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", RUNNER, os.path.basename(script)]
+            + ["--workers", str(args.workers)]
+            + (["--max-rate", "0"] if name in RATE_LIMITED else []),
+            cwd=workdir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+        wall = time.perf_counter() - start
+
+        if proc.returncode != 0:
+            tail = proc.stdout.decode("utf-8", "replace")[-2000:]
+            print(f"{name} exited with {proc.returncode}:\n{tail}", file=sys.stderr)
+        with open(os.path.join(workdir, "peak_memory.txt"), encoding="ascii") as f:
+            peak_memory = int(f.read())
+
+    stats = {k: v - before.get(k, 0) for k, v in server.api.stats.items()}
+    requests = stats.get("requests", 0)
+    return {
+        "workload": name,
+        "pages": pages,
+        "targets": targets,
+        "requests": requests,
+        "requests_per_page": requests / targets if targets else 0.0,
+        "edits": stats.get("action.edit", 0),
+        "bytes": stats.get("bytes.out", 0),
+        "wall": wall,
+        "peak_memory": peak_memory,
+        "returncode": proc.returncode,
+    }
+
+
+def main() -> None:
+    """Run the requested workloads and print a report."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--size", type=int, default=2000, help="bytes per page")
+    parser.add_argument("--latency", type=float, default=0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--stale-search", action="store_true", help="never update the search index"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="concurrency, for scripts that take it"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    header = (
+        f"{'workload':<18}{'pages':>8}{'targets':>9}{'requests':>10}"
+        f"{'req/page':>10}{'edits':>8}{'MB out':>9}{'wall s':>9}{'peak MB':>9}"
+    )
+    print(header)
+    results = []
+    for pages in args.sizes:
+        for name in args.workloads:
+            result = run(name, pages, args)
+            results.append(result)
+            print(
+                f"{name:<18}{pages:>8}{result['targets']:>9}{result['requests']:>10}"
+                f"{result['requests_per_page']:>10.3f}{result['edits']:>8}"
+                f"{result['bytes'] / 2**20:>9.1f}{result['wall']:>9.2f}"
+                f"{result['peak_memory'] / 2**20:>9.1f}",
+                flush=True,
+            )
+            if name not in READ_ONLY and result["edits"] < result["targets"]:
+                print(
+                    f"{name} edited {result['edits']} of {result['targets']} targets",
+                    file=sys.stderr,
+                )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
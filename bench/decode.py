@@ -0,0 +1,93 @@
+"""Compare the old and new response decoding paths of MwApi.
+
+The old path detected the charset of every response before parsing it
+with requests, while the new one parses the UTF-8 bytes directly, with
+orjson if it is installed. Payloads mimic a batch of page revisions.
+
+  Typical usage example:
+
+  python bench/decode.py --sizes 1 4 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Callable
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mwapi import loads, orjson  # pylint: disable=wrong-import-position
+
+
+def payload(megabytes: float) -> bytes:
+    """Build a revisions response of about the given size."""
+    filler = "这是一段用于填充页面的文本。 Lorem ipsum {{Navbox}} [[分类:测试]]\n"
+    text = filler * (2000 // len(filler.encode("utf-8")) + 1)
+    count = int(megabytes * 2**20 / len(text.encode("utf-8"))) + 1
+    pages = {
+        str(i): {
+            "pageid": i,
+            "ns": 0,
+            "title": f"Page {i}",
+            "revisions": [
+                {
+                    "revid": i,
+                    "timestamp": "2023-05-22T00:00:00Z",
+                    "slots": {"main": {"contentmodel": "wikitext", "*": text}},
+                }
+            ],
+        }
+        for i in range(count)
+    }
+    body = {"batchcomplete": "", "query": {"pages": pages}}
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def response(data: bytes) -> requests.Response:
+    """Wrap a body in a response as the API would send it."""
+    rsp = requests.Response()
+    rsp._content = data  # pylint: disable=protected-access
+    rsp.status_code = 200
+    rsp.headers["Content-Type"] = "application/json; charset=utf-8"
+    return rsp
+
+
+def old(data: bytes) -> None:
+    """Decode like MwApi used to."""
+    rsp = response(data)
+    rsp.encoding = rsp.apparent_encoding
+    rsp.json()
+
+
+def new(data: bytes) -> None:
+    """Decode like MwApi does now."""
+    loads(response(data).content)
+
+
+def main() -> None:
+    """Time both paths on each payload size."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths: dict[str, Callable[[bytes], None]] = {"old": old, "new": new}
+    print(f"orjson: {'yes' if orjson is not None else 'no'}")
+    print(f"{'MB':>6}{'old ms':>10}{'new ms':>10}{'speedup':>9}")
+    for size in args.sizes:
+        data = payload(size)
+        times = {
+            name: min(timeit.repeat(lambda: path(data), number=1, repeat=args.repeat))
+            for name, path in paths.items()
+        }
+        print(
+            f"{len(data) / 2**20:>6.1f}{times['old'] * 1000:>10.1f}"
+            f"{times['new'] * 1000:>10.1f}{times['old'] / times['new']:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,839 @@
+"""A local stand-in for the MediaWiki action API.
+
+This module contains an in-memory wiki and an HTTP server answering the
+subset of the action API used by mwapi.py and the task scripts: login and
+tokens, revisions/info/categoryinfo/categories props, the categorymembers,
+search, backlinks, embeddedin, allpages and usercontribs lists (also as
+generators), edit and move. Latency, maxlag and server errors can be
+injected to exercise retry paths.
+
+  Typical usage example:
+
+  wiki = FakeWiki.seeded(pages=1000)
+  with FakeWikiServer(wiki) as server:
+      api = MwApi(server.url)
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+APIDict = dict[str, Any]
+
+NAMESPACES = {
+    "User": 2,
+    "MGP": 4,
+    "File": 6,
+    "MediaWiki": 8,
+    "Template": 10,
+    "Category": 14,
+    "Module": 828,
+}
+ALIASES = {"分类": "Category", "分類": "Category", "Cat": "Category", "文件": "File"}
+
+CATEGORY_LINK = re.compile(r"\[\[(?:Category|分[类類]|cat)\s*:\s*([^|\]]+)", re.I)
+WIKI_LINK = re.compile(r"\[\[([^|\]#:][^|\]#]*)")
+TEMPLATE_LINK = re.compile(r"\{\{\s*([^|}]+)")
+
+
+def normalize(title: str) -> str:
+    """Normalize a title the way MediaWiki does for the seeded namespaces."""
+    title = title.replace("_", " ").strip()
+    if ":" in title:
+        prefix, rest = title.split(":", 1)
+        prefix = ALIASES.get(prefix.strip().capitalize(), prefix.strip())
+        prefix = prefix[:1].upper() + prefix[1:]
+        if prefix in NAMESPACES:
+            rest = rest.strip()
+            return prefix + ":" + rest[:1].upper() + rest[1:]
+    return title[:1].upper() + title[1:]
+
+
+def namespace(title: str) -> int:
+    """Get the namespace number of a normalized title."""
+    prefix = title.split(":", 1)[0] if ":" in title else ""
+    return NAMESPACES.get(prefix, 0)
+
+
+def timestamp(value: float) -> str:
+    """Format a POSIX time as a MediaWiki timestamp."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(value))
+
+
+class Page:
+    """A page with its latest revision."""
+
+    def __init__(self, pageid: int, title: str) -> None:
+        self.pageid = pageid
+        self.title = title
+        self.ns = namespace(title)
+        self.text = ""
+        self.revid = 0
+        self.touched = 0.0
+        self.categories: list[str] = []
+        self.links: list[str] = []
+        self.templates: list[str] = []
+
+    @property
+    def redirect(self) -> Optional[str]:
+        """Target of the page if it is a redirect."""
+        match = re.match(r"#(?:REDIRECT|重定向)\s*\[\[([^\]|]+)", self.text, re.I)
+        return normalize(match.group(1)) if match else None
+
+    @property
+    def sha1(self) -> str:
+        """SHA-1 of the latest revision text."""
+        return hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+
+
+class FakeWiki:
+    """An in-memory wiki."""
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.pages: dict[int, Page] = {}
+        self.titles: dict[str, int] = {}
+        self.contribs: list[APIDict] = []
+        self.category_members: dict[str, dict[int, Page]] = {}
+        self.next_pageid = 1
+        self.next_revid = 1
+        self.clock = 1_600_000_000.0
+
+    def save(self, title: str, text: str, user: str = "Seed") -> Page:
+        """Create or overwrite a page."""
+        with self.lock:
+            title = normalize(title)
+            if title in self.titles:
+                page = self.pages[self.titles[title]]
+            else:
+                while self.next_pageid in self.pages:
+                    self.next_pageid += 1
+                page = Page(self.next_pageid, title)
+                self.pages[page.pageid] = page
+                self.titles[title] = page.pageid
+                self.next_pageid += 1
+            page.text = text
+            page.revid = self.next_revid
+            self.next_revid += 1
+            self.clock += 1
+            page.touched = self.clock
+            for category in page.categories:
+                self.category_members[category].pop(page.pageid, None)
+            page.categories = [
+                normalize("Category:" + c) for c in CATEGORY_LINK.findall(text)
+            ]
+            for category in page.categories:
+                self.category_members.setdefault(category, {})[page.pageid] = page
+            page.links = [normalize(t) for t in WIKI_LINK.findall(text)]
+            page.templates = [
+                normalize(t if ":" in t else "Template:" + t)
+                for t in TEMPLATE_LINK.findall(text)
+            ]
+            self.contribs.append(
+                {
+                    "user": user,
+                    "pageid": page.pageid,
+                    "revid": page.revid,
+                    "ns": page.ns,
+                    "title": page.title,
+                    "timestamp": timestamp(page.touched),
+                }
+            )
+            return page
+
+    def get(self, title: str) -> Optional[Page]:
+        """Get a page by title."""
+        pageid = self.titles.get(normalize(title))
+        return None if pageid is None else self.pages[pageid]
+
+    def members(self, category: str) -> list[Page]:
+        """Get the members of a category."""
+        return list(self.category_members.get(normalize(category), {}).values())
+
+    @classmethod
+    def seeded(
+        cls,
+        pages: int = 1000,
+        *,
+        categories: int = 50,
+        depth: int = 3,
+        root: str = "追踪分类",
+        root_id: Optional[int] = None,
+        file_category: str = "测试文件",
+        needle: str = "FAKEWIKI_NEEDLE",
+        match_ratio: float = 0.5,
+        size: int = 2000,
+        subscribers: int = 50,
+        cycle: bool = False,
+        seed: int = 0,
+    ) -> "FakeWiki":
+        """Build a wiki with a category tree, files, articles and users.
+
+        Every tenth page is a file, and all files are also placed in
+        file_category. A match_ratio share of the pages contains needle.
+        If cycle is set, the category tree gets a cycle back to the root.
+        """
+        rng = random.Random(seed)
+        wiki = cls()
+        wiki.next_pageid = root_id or 1
+        wiki.save("Category:" + root, "Root tracking category.")
+        wiki.next_pageid = 1
+
+        # Category tree: each category is placed under a random shallower one
+        cats = [root]
+        parents = [(root, 0)]
+        for i in range(categories):
+            parent, level = rng.choice(parents)
+            name = f"分类{i}"
+            cats.append(name)
+            if level + 1 < depth:
+                parents.append((name, level + 1))
+            wiki.save("Category:" + name, f"[[Category:{parent}]]")
+        # A cycle back to the root and a shared subcategory
+        if cycle and categories >= 2:
+            wiki.save(
+                "Category:" + root, f"Root tracking category.[[Category:{cats[-1]}]]"
+            )
+            wiki.save("Category:分类0", f"[[Category:{root}]][[Category:{cats[-1]}]]")
+
+        filler = "这是一段用于填充页面的文本。 Lorem ipsum dolor sit amet. "
+        body = (filler * (size // len(filler) + 1))[:size]
+        for i in range(pages):
+            cat = rng.choice(cats)
+            hit = rng.random() < match_ratio
+            text = (
+                body
+                + ("\n" + needle if hit else "")
+                + f"\n[[Page {rng.randrange(pages)}]]{{{{Navbox}}}}"
+                + f"\n[[Category:{cat}]]"
+            )
+            if i % 10 == 0:
+                wiki.save(f"File:Image {i}.png", text + f"[[Category:{file_category}]]")
+            else:
+                wiki.save(f"Page {i}", text)
+
+        wiki.save("Template:Navbox", "navbox")
+        wiki.save("Module:碧蓝航线Equips/data", "return {}")
+        lines = (f"# [[User talk:Subscriber {i}]]" for i in range(subscribers))
+        wiki.save("MGP:萌娘百科月报/月饼/订阅", "\n".join(lines))
+        return wiki
+
+
+class FakeWikiApi:
+    """Answer action API requests against a FakeWiki.
+
+    The search index catches up with every edit, so pages that no longer
+    match drop out of the results, shifting later offsets. If stale_search
+    is set, the results of the first search are kept for good instead.
+    """
+
+    MAX_RESULT = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        wiki: FakeWiki,
+        *,
+        users: Optional[dict[str, str]] = None,
+        bot: bool = True,
+        lag: float = 0,
+        error_rate: float = 0,
+        max_result: Optional[int] = None,
+        stale_search: bool = False,
+    ) -> None:
+        self.wiki = wiki
+        self.users = users if users is not None else {"Bot@bot": "password"}
+        self.bot = bot
+        self.lag = lag
+        self.error_rate = error_rate
+        self.max_result = max_result or self.MAX_RESULT
+        self.stale_search = stale_search
+        self.sessions: dict[str, str] = {}
+        self.login_tokens: set[str] = set()
+        self.stats: dict[str, int] = {}
+        self.stats_lock = threading.Lock()
+        self.rng = random.Random(0)
+        self.scans: dict[tuple[str, str], tuple[int, list[Any]]] = {}
+
+    def count(self, key: str, value: int = 1) -> None:
+        """Increase a request counter."""
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def scan(
+        self, name: str, key: str, build: Callable[[], list[Any]], live: bool = True
+    ) -> list[Any]:
+        """Run a full scan of the wiki once per revision and list module.
+
+        Scans that are not live are kept for good, like a search index that
+        has not caught up with the edits yet.
+        """
+        version, items = self.scans.get((name, key), (-1, []))
+        if version == -1 or live and version != self.wiki.next_revid:
+            items = build()
+            self.scans[(name, key)] = (self.wiki.next_revid, items)
+        return items
+
+    @property
+    def limit(self) -> int:
+        """The value of limit=max for the current user."""
+        return 5000 if self.bot else 500
+
+    def handle(
+        self, params: dict[str, str], session: Optional[str]
+    ) -> tuple[int, APIDict, dict[str, str]]:
+        """Handle one request, returning status, body and extra headers."""
+        action = params.get("action", "")
+        self.count("requests")
+        self.count("action." + action)
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.count("injected.errors")
+            return 503, {}, {"Retry-After": "0"}
+
+        if "maxlag" in params and self.lag > float(params["maxlag"]):
+            self.count("injected.maxlag")
+            return (
+                200,
+                {
+                    "error": {
+                        "code": "maxlag",
+                        "info": f"Waiting for a database server: {self.lag} seconds lagged.",
+                        "host": "fakewiki",
+                        "lag": self.lag,
+                        "type": "db",
+                    }
+                },
+                {"Retry-After": str(int(self.lag)), "X-Database-Lag": str(self.lag)},
+            )
+
+        user = self.sessions.get(session or "")
+        with self.wiki.lock:
+            if action == "query":
+                return 200, self.query(params, user), {}
+            if action == "login":
+                return self.login(params)
+            if action in ("edit", "move"):
+                if user is None or params.get("token") != self.csrf(session):
+                    return 200, self.error("badtoken", "Invalid CSRF token."), {}
+                if action == "edit":
+                    return 200, self.edit(params, user), {}
+                return 200, self.move(params), {}
+        return 200, self.error("badvalue", "Unrecognized action."), {}
+
+    @staticmethod
+    def error(code: str, info: str) -> APIDict:
+        """Build an error response."""
+        return {"error": {"code": code, "info": info}}
+
+    @staticmethod
+    def csrf(session: Optional[str]) -> str:
+        """CSRF token of a session."""
+        return hashlib.md5(("csrf" + str(session)).encode()).hexdigest() + "+\\"
+
+    def login(self, params: dict[str, str]) -> tuple[int, APIDict, dict[str, str]]:
+        """Handle action=login."""
+        token = params.get("lgtoken", "")
+        if token not in self.login_tokens:
+            return 200, {"login": {"result": "Failed", "reason": "badtoken"}}, {}
+        name = params.get("lgname", "")
+        if self.users.get(name) != params.get("lgpassword"):
+            return 200, {"login": {"result": "Failed", "reason": "wrongpassword"}}, {}
+        session = hashlib.md5(f"{name}{time.time()}{random.random()}".encode())
+        session_id = session.hexdigest()
+        self.sessions[session_id] = name.split("@")[0]
+        return (
+            200,
+            {"login": {"result": "Success", "lgusername": name.split("@")[0]}},
+            {"Set-Cookie": f"fakewiki_session={session_id}; Path=/"},
+        )
+
+    def resolve(self, params: dict[str, str], query: APIDict) -> list[APIDict]:
+        """Resolve titles/pageids into page objects."""
+        out: list[APIDict] = []
+        if "titles" in params:
+            for raw in params["titles"].split("|"):
+                title = normalize(raw)
+                if not title or re.search(r"[<>\[\]{}]", title):
+                    out.append({"title": raw, "invalid": ""})
+                    continue
+                if title != raw:
+                    query.setdefault("normalized", []).append(
+                        {"from": raw, "to": title}
+                    )
+                page = self.wiki.get(title)
+                if page is not None and page.redirect and "redirects" in params:
+                    query.setdefault("redirects", []).append(
+                        {"from": title, "to": page.redirect}
+                    )
+                    title = page.redirect
+                    page = self.wiki.get(title)
+                if page is None:
+                    out.append({"ns": namespace(title), "title": title, "missing": ""})
+                else:
+                    out.append({"pageid": page.pageid})
+        elif "pageids" in params:
+            for raw in params["pageids"].split("|"):
+                page = self.wiki.pages.get(int(raw))
+                if page is None:
+                    out.append({"pageid": int(raw), "missing": ""})
+                    continue
+                if page.redirect and "redirects" in params:
+                    query.setdefault("redirects", []).append(
+                        {"from": page.title, "to": page.redirect}
+                    )
+                    target = self.wiki.get(page.redirect)
+                    if target is None:
+                        out.append(
+                            {
+                                "ns": namespace(page.redirect),
+                                "title": page.redirect,
+                                "missing": "",
+                            }
+                        )
+                        continue
+                    page = target
+                out.append({"pageid": page.pageid})
+        return out
+
+    def list_module(
+        self, name: str, params: dict[str, str], prefix: str
+    ) -> tuple[list[APIDict], Optional[APIDict]]:
+        """Run a list module, returning results and its continuation."""
+        p = {k[len(prefix) :]: v for k, v in params.items() if k.startswith(prefix)}
+        limit_param = p.get("limit", "10")
+        limit = self.limit if limit_param == "max" else int(limit_param)
+        items: list[Any]
+        cont_key = "continue"
+        if name == "categorymembers":
+            if "pageid" in p:
+                cat = self.wiki.pages.get(int(p["pageid"]))
+                items = self.wiki.members(cat.title) if cat else []
+            else:
+                items = self.wiki.members(p.get("title", ""))
+            types = p.get("type", "page|subcat|file").split("|")
+            items = sorted(
+                (x for x in items if self.member_type(x) in types),
+                key=lambda x: x.pageid,
+            )
+            # Continue from a pageid so that members leaving are not skipped
+            if "continue" in p:
+                start = int(p.pop("continue").rsplit("|", 1)[-1])
+                items = [x for x in items if x.pageid >= start]
+        elif name == "search":
+            needle = p.get("search", "").replace("insource:", "").strip("\"'/")
+            items = self.scan(
+                name,
+                needle,
+                lambda: [x for x in self.wiki.pages.values() if needle in x.text],
+                live=not self.stale_search,
+            )
+            cont_key = "offset"
+            limit = min(limit, 500)
+        elif name in ("backlinks", "embeddedin"):
+            target = self.wiki.get(p.get("title", "")) if "title" in p else None
+            if "pageid" in p:
+                target = self.wiki.pages.get(int(p["pageid"]))
+            field = "links" if name == "backlinks" else "templates"
+            items = self.scan(
+                name,
+                target.title if target is not None else "",
+                lambda: [
+                    x
+                    for x in self.wiki.pages.values()
+                    if target is not None and target.title in getattr(x, field)
+                ],
+            )
+        elif name == "allpages":
+            ns = int(p.get("namespace", "0"))
+            items = self.scan(
+                name,
+                str(ns),
+                lambda: sorted(
+                    (x for x in self.wiki.pages.values() if x.ns == ns),
+                    key=lambda x: x.title,
+                ),
+            )
+        elif name == "usercontribs":
+            users = p.get("user", "").split("|")
+            items = [c for c in self.wiki.contribs if c["user"] in users]
+            items = sorted(items, key=lambda c: c["revid"], reverse=True)
+            if p.get("dir") == "newer":
+                items.reverse()
+        else:
+            raise KeyError(name)
+
+        if "namespace" in p and name != "allpages":
+            spaces = {int(n) for n in p["namespace"].split("|")}
+            items = [x for x in items if self.ns_of(x) in spaces]
+
+        offset = int(p.get(cont_key, "0"))
+        batch = items[offset : offset + limit]
+        cont = None
+        if offset + limit < len(items):
+            cont = {prefix + cont_key: str(offset + limit)}
+            if name == "categorymembers":
+                after = items[offset + limit]
+                cont[prefix + cont_key] = f"{self.member_type(after)}|{after.pageid}"
+        out = []
+        for x in batch:
+            if isinstance(x, dict):
+                out.append(dict(x))
+                continue
+            entry = {"pageid": x.pageid, "ns": x.ns, "title": x.title}
+            if name == "categorymembers":
+                entry["type"] = self.member_type(x)
+            if name == "search":
+                entry["size"] = len(x.text.encode("utf-8"))
+            out.append(entry)
+        return out, cont
+
+    @staticmethod
+    def ns_of(item: Any) -> int:
+        """Namespace of a list item."""
+        return int(item["ns"]) if isinstance(item, dict) else int(item.ns)
+
+    @staticmethod
+    def member_type(page: Page) -> str:
+        """Category member type of a page."""
+        return {14: "subcat", 6: "file"}.get(page.ns, "page")
+
+    def query(self, params: dict[str, str], user: Optional[str]) -> APIDict:
+        """Handle action=query."""
+        res: APIDict = {"batchcomplete": ""}
+        query: APIDict = {}
+        cont: APIDict = {}
+
+        for meta in filter(None, params.get("meta", "").split("|")):
+            if meta == "tokens":
+                types = params.get("type", "csrf").split("|")
+                tokens = {}
+                for kind in types:
+                    if kind == "login":
+                        token = hashlib.md5(str(random.random()).encode()).hexdigest()
+                        self.login_tokens.add(token + "+\\")
+                        tokens["logintoken"] = token + "+\\"
+                    else:
+                        session = self.session_of(user)
+                        tokens[kind + "token"] = self.csrf(session) if user else "+\\"
+                query["tokens"] = tokens
+            elif meta == "userinfo":
+                props = params.get("uiprop", "").split("|")
+                info: APIDict = {"id": 0, "name": "127.0.0.1", "anon": ""}
+                if user:
+                    info = {"id": 1, "name": user}
+                if "groups" in props:
+                    info["groups"] = ["*", "user", "bot"] if user and self.bot else []
+                if "rights" in props:
+                    info["rights"] = (
+                        ["read", "edit", "apihighlimits"]
+                        if user and self.bot
+                        else ["read"]
+                    )
+                query["userinfo"] = info
+            elif meta == "siteinfo":
+                query["general"] = {"sitename": "FakeWiki", "generator": "FakeWiki"}
+
+        for name in filter(None, params.get("list", "").split("|")):
+            prefix = self.PREFIXES[name]
+            items, more = self.list_module(name, params, prefix)
+            query[name] = items
+            if more:
+                cont.update(more)
+            if name == "search":
+                query["searchinfo"] = {"totalhits": len(items)}
+
+        targets: list[APIDict] = []
+        generator = params.get("generator")
+        if generator:
+            prefix = "g" + self.PREFIXES[generator]
+            items, more = self.list_module(generator, params, prefix)
+            targets = [{"pageid": x["pageid"]} for x in items]
+            gen_cont = more
+            cur = {k: v for k, v in params.items() if k == prefix + "continue"}
+            cur.update({k: v for k, v in params.items() if k == prefix + "offset"})
+        else:
+            targets = self.resolve(params, query)
+            gen_cont = None
+            cur = {}
+
+        props = list(filter(None, params.get("prop", "").split("|")))
+        # Modules already complete in this batch are listed after "||"
+        done = params.get("continue", "").partition("||")[2].split("|")
+        props = [p for p in props if p not in done]
+        if targets or props:
+            pages, prop_cont = self.props(targets, props, params)
+            if pages:
+                query["pages"] = pages
+            if prop_cont:
+                cont.update(prop_cont)
+                cont.update(cur)
+                complete = "|".join(
+                    [d for d in done if d] + [p for p in props if p != "revisions"]
+                )
+                head = ""
+                if generator:
+                    head = "g" + self.PREFIXES[generator]
+                    head += "offset" if generator == "search" else "continue"
+                cont["continue"] = head + "||" + complete
+            elif gen_cont:
+                cont.update(gen_cont)
+                cont["continue"] = "-||"
+
+        if cont:
+            cont.setdefault("continue", "-||")
+            res["continue"] = cont
+            if any(k for k in cont if not k.startswith("g") and k != "continue"):
+                res.pop("batchcomplete")
+        if query:
+            res["query"] = query
+        return res
+
+    PREFIXES = {
+        "categorymembers": "cm",
+        "search": "sr",
+        "backlinks": "bl",
+        "embeddedin": "ei",
+        "allpages": "ap",
+        "usercontribs": "uc",
+    }
+
+    def session_of(self, user: Optional[str]) -> Optional[str]:
+        """Find the session id of a user."""
+        for session, name in self.sessions.items():
+            if name == user:
+                return session
+        return None
+
+    def props(
+        self, targets: list[APIDict], props: list[str], params: dict[str, str]
+    ) -> tuple[APIDict, Optional[APIDict]]:
+        """Apply prop modules to resolved pages."""
+        pages: APIDict = {}
+        missing = -1
+        cont = None
+        budget = self.max_result
+        start = int(params.get("rvcontinue", "0").split("|")[0])
+        cl_start = params.get("clcontinue")
+        rvprop = params.get("rvprop", "ids|timestamp|flags|comment|user").split("|")
+        for target in targets:
+            if "pageid" not in target or target["pageid"] not in self.wiki.pages:
+                entry = dict(target)
+                key = str(target["pageid"]) if "pageid" in target else str(missing)
+                if "pageid" not in target:
+                    missing -= 1
+                pages[key] = entry
+                continue
+            page = self.wiki.pages[target["pageid"]]
+            entry = {"pageid": page.pageid, "ns": page.ns, "title": page.title}
+            pages[str(page.pageid)] = entry
+            if "info" in props:
+                entry.update(
+                    {
+                        "contentmodel": "wikitext",
+                        "touched": timestamp(page.touched),
+                        "lastrevid": page.revid,
+                        "length": len(page.text.encode("utf-8")),
+                    }
+                )
+                if page.redirect:
+                    entry["redirect"] = ""
+            if "categoryinfo" in props and page.ns == 14:
+                members = self.wiki.members(page.title)
+                kinds = [self.member_type(m) for m in members]
+                entry["categoryinfo"] = {
+                    "size": len(kinds),
+                    "pages": kinds.count("page"),
+                    "files": kinds.count("file"),
+                    "subcats": kinds.count("subcat"),
+                }
+            if "categories" in props and page.categories and cl_start is None:
+                entry["categories"] = [{"ns": 14, "title": c} for c in page.categories]
+            if "revisions" in props:
+                if page.pageid < start:
+                    continue
+                rev: APIDict = {}
+                if "ids" in rvprop:
+                    rev.update({"revid": page.revid, "parentid": page.revid - 1})
+                if "timestamp" in rvprop:
+                    rev["timestamp"] = timestamp(page.touched)
+                if "sha1" in rvprop:
+                    rev["sha1"] = page.sha1
+                if "size" in rvprop:
+                    rev["size"] = len(page.text.encode("utf-8"))
+                if "content" in rvprop:
+                    size = len(page.text.encode("utf-8"))
+                    if size > budget and cont is None and pages:
+                        cont = {"rvcontinue": f"{page.pageid}|{page.revid}"}
+                    if cont is not None:
+                        continue
+                    budget -= size
+                    if "rvslots" in params:
+                        rev["slots"] = {
+                            "main": {
+                                "contentmodel": "wikitext",
+                                "contentformat": "text/x-wiki",
+                                "*": page.text,
+                            }
+                        }
+                    else:
+                        rev["*"] = page.text
+                entry["revisions"] = [rev]
+        return pages, cont
+
+    def edit(self, params: dict[str, str], user: str) -> APIDict:
+        """Handle action=edit."""
+        if "pageid" in params:
+            page = self.wiki.pages.get(int(params["pageid"]))
+            if page is None:
+                return self.error("nosuchpageid", "There is no page with that ID.")
+            title = page.title
+        else:
+            title = normalize(params.get("title", ""))
+            page = self.wiki.get(title)
+        if page is None and "nocreate" in params:
+            return self.error("missingtitle", "The page you specified doesn't exist.")
+        if page is not None and params.get("basetimestamp"):
+            base = params["basetimestamp"]
+            if base != timestamp(page.touched):
+                return self.error("editconflict", "Edit conflict.")
+        if page is not None and params.get("baserevid"):
+            if int(params["baserevid"]) != page.revid:
+                return self.error("editconflict", "Edit conflict.")
+        old = page.text if page else ""
+        if "text" in params:
+            text = params["text"]
+        else:
+            text = params.get("prependtext", "") + old + params.get("appendtext", "")
+        if page is not None and text == old:
+            return {
+                "edit": {
+                    "result": "Success",
+                    "pageid": page.pageid,
+                    "title": page.title,
+                    "contentmodel": "wikitext",
+                    "nochange": "",
+                }
+            }
+        oldrevid = page.revid if page else 0
+        page = self.wiki.save(title, text, user)
+        return {
+            "edit": {
+                "result": "Success",
+                "pageid": page.pageid,
+                "title": page.title,
+                "contentmodel": "wikitext",
+                "oldrevid": oldrevid,
+                "newrevid": page.revid,
+                "newtimestamp": timestamp(page.touched),
+            }
+        }
+
+    def move(self, params: dict[str, str]) -> APIDict:
+        """Handle action=move."""
+        if "fromid" in params:
+            page = self.wiki.pages.get(int(params["fromid"]))
+        else:
+            page = self.wiki.get(params.get("from", ""))
+        if page is None:
+            return self.error("missingtitle", "The page you specified doesn't exist.")
+        to = normalize(params.get("to", ""))
+        if to in self.wiki.titles:
+            return self.error("articleexists", "A page of that name already exists.")
+        old = page.title
+        del self.wiki.titles[old]
+        page.title = to
+        page.ns = namespace(to)
+        self.wiki.titles[to] = page.pageid
+        # Boolean parameters are true whenever present, whatever their value
+        if "noredirect" not in params:
+            self.wiki.save(old, f"#REDIRECT [[{to}]]")
+        return {"move": {"from": old, "to": to, "reason": params.get("reason", "")}}
+
+
+class FakeWikiServer:
+    """Serve a FakeWikiApi over HTTP on a local port."""
+
+    def __init__(
+        self,
+        wiki: Optional[FakeWiki] = None,
+        *,
+        latency: float = 0,
+        port: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        self.api = FakeWikiApi(wiki or FakeWiki.seeded(), **kwargs)
+        self.latency = latency
+        api = self.api
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler bound to this server."""
+
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately on a keep-alive socket
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: Any) -> None:
+                # pylint: disable=redefined-builtin
+                pass
+
+            def respond(self, params: dict[str, str]) -> None:
+                if server.latency:
+                    time.sleep(server.latency)
+                cookie = self.headers.get("Cookie", "")
+                match = re.search(r"fakewiki_session=(\w+)", cookie)
+                status, body, headers = api.handle(
+                    params, match.group(1) if match else None
+                )
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                api.count("bytes.out", len(data))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Date", formatdate(usegmt=True))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                query = urlsplit(self.path).query
+                api.count("bytes.in", len(self.path))
+                self.respond(dict(parse_qsl(query, keep_blank_values=True)))
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                length = int(self.headers.get("Content-Length", "0"))
+                body = self.rfile.read(length).decode("utf-8")
+                api.count("bytes.in", length)
+                self.respond(dict(parse_qsl(body, keep_blank_values=True)))
+
+        class Server(ThreadingHTTPServer):
+            """HTTP server ignoring clients that hang up."""
+
+            def handle_error(self, request: Any, client_address: Any) -> None:
+                pass
+
+        self.httpd = Server(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """URL of the API endpoint."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api.php"
+
+    def __enter__(self) -> "FakeWikiServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,42 +1,69 @@
 """This script is used to batch flag files for deletion."""
-from mwapi import MwApi
+import argparse
+import hashlib
+
+from mwapi import BulkEditor, EditJob, JobJournal, MwApi
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, default=4, help="concurrent edits")
+parser.add_argument(
+    "--max-rate", type=float, default=60, help="edits per minute, 0 for no limit"
+)
+parser.add_argument(
+    "--reset", action="store_true", help="flag pages already flagged by this list"
+)
+args = parser.parse_args()
 
 print("Logging in...")
 SITE = "cm"
 
 api = MwApi()
-api.login_with_config("passwords.py", SITE)
+api.login_with_config("passwords.py", SITE, "session.json")
 print("Logged in")
 
 print("Opening list of pages...")
-jobs = []
+pages = []
 with open("pages.txt", encoding="utf-8") as f:
-    jobs = [page for page in (p.strip() for p in f) if page]
+    pages = [page for page in (p.strip() for p in f) if page]
 
-print(jobs)
+print(pages)
 print("Got list of pages.")
 
-with open("error.log", "w", encoding="utf-8") as f:
-    for page in jobs:
-        print("Working on " + page + "...")
-        # zhapi = MwApi(CONFIG["zh"][0])
-        # fu = zhapi.fileUsage(page)
-        # print(fu)
-        # if "known" not in fu["-1"]:
-        #     print(page + "does not exist, skipping...")
-        #     f.write(page + ": missing\n")
-        #     continue
-        # if "fileusage" in fu["-1"]:
-        #     print(page + "has backlinks, skipping...")
-        #     f.write(page + "backlinks\n")
-        #     continue
-        print("Flagging " + page + " for deletion...")
-        api.replace(
-            page,
-            text=r"<noinclude>{{即将删除|代U:Leranjun挂删：用户私人文件|user=Eizenchan}}</noinclude>",
-            bot=True,
-            summary="挂删：用户私人文件",
-            tags="Bot",
-            nocreate=True,
-        )
-        print("Finished " + page + ".")
+jobs = (
+    EditJob(
+        page,
+        "replace",
+        {
+            "text": r"<noinclude>{{即将删除|代U:Leranjun挂删：用户私人文件|user=Eizenchan}}</noinclude>",
+            "bot": True,
+            "summary": "挂删：用户私人文件",
+            "tags": "Bot",
+            "nocreate": True,
+        },
+    )
+    for page in pages
+)
+
+# Each list of pages is its own job, so a new list is not skipped as done
+digest = hashlib.sha1("\n".join(pages).encode("utf-8")).hexdigest()
+journal = JobJournal("journal.sqlite", "batch_ffd " + digest)
+if args.reset:
+    journal.clear()
+journal.plan(pages)
+editor = BulkEditor(
+    api,
+    workers=args.workers,
+    max_rate=args.max_rate,
+    error_log="error.log",
+    journal=journal,
+)
+for result in editor.run(jobs):
+    if result.ok:
+        print("Flagged " + str(result.job.target) + " for deletion.")
+    else:
+        print("Failed to flag " + str(result.job.target) + ": " + str(result.error))
+
+print(
+    f"Finished: {editor.succeeded} flagged, {editor.failed} failed, "
+    f"{editor.skipped} already flagged."
+)
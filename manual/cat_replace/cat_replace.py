@@ -1,54 +1,120 @@
 """Replace categories in files."""
+import argparse
 import ast
 import re
+from typing import Iterator
 
-from mwapi import MwApi
+from mwapi import (
+    BulkEditor,
+    EditJob,
+    JobJournal,
+    MwApi,
+    PageCache,
+    PageSnapshot,
+    TransformPool,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, default=4, help="concurrent edits")
+parser.add_argument(
+    "--max-rate", type=float, default=60, help="edits per minute, 0 for no limit"
+)
+parser.add_argument(
+    "--timeout", type=float, default=60, help="seconds to transform a page"
+)
+args = parser.parse_args()
 
 with open("config.py", "r", encoding="utf-8") as f:
     CONFIG = ast.literal_eval(f.read())
 
-api = MwApi()
-api.login_with_config("passwords.py", CONFIG["site"])
+cache = PageCache("cache.sqlite")
+api = MwApi(cache=cache, skip_unchanged=True)
+api.login_with_config("passwords.py", CONFIG["site"], "session.json")
 print("Logged in")
 
 before = CONFIG["before"]
 after = CONFIG["after"]
 
-pages = api.list_category_members(before, cmprop="ids", cmtype="file")
-print(pages)
-print("Got list of pages.")
-
-for x in pages:
-    print("Working on: " + str(x["pageid"]))
-    content = api.get_content(pageid=x["pageid"])
-
-    if content is None:
-        print("Failed to get content for pageid: " + str(x["pageid"]))
-        continue
-
-    # Remove random unicode character
-    content = re.sub(
-        r"[\u1680\u180E\u2000-\u200B\u200E\u200F\u2028-\u202F\u205F]+", "", content
-    )
-    content = re.sub(r"([^\xA0])\xA0([^\xA0])", r"\1 \2", content)
-
-    content = re.sub(
-        r"\[\[(?:Category|分[类類]|cat)\:" + re.escape(before) + r"(\|.*?)?\]\]",
-        r"[[分类:" + after + r"\1]]" if after else "",
-        content,
-        flags=re.I,
-    )
-
-    print(
-        api.replace(
-            pageid=x["pageid"],
-            text=content,
-            suppressAbuseFilter=True,
-            bot=True,
-            minor=True,
-            summary="分类替换：【" + before + "】→【" + after + "】",
-            tags="Bot",
+# Random unicode characters
+INVISIBLE = re.compile(r"[\u1680\u180E\u2000-\u200B\u200E\u200F\u2028-\u202F\u205F]+")
+# A single non-breaking space between two other characters
+NBSP = re.compile(r"([^\xA0])\xA0([^\xA0])")
+CATEGORY = re.compile(
+    r"\[\[(?:Category|分[类類]|cat)\:" + re.escape(before) + r"(\|.*?)?\]\]", re.I
+)
+
+
+def transform(content: str) -> str:
+    """Clean up the content and replace the category."""
+    content = INVISIBLE.sub("", content)
+    content = NBSP.sub(r"\1 \2", content)
+
+    return CATEGORY.sub(r"[[分类:" + after + r"\1]]" if after else "", content)
+
+
+journal = JobJournal("journal.sqlite", before + "→" + after)
+pages = api.iter_generator(
+    "categorymembers",
+    skip={int(k) for k in journal.keys(JobJournal.EDITED)},
+    gcmtitle="Category:" + before,
+    gcmtype="file",
+)
+
+
+def fetched() -> Iterator[PageSnapshot]:
+    """Yield the pages in the category that have content."""
+    for x in pages:
+        snapshot = PageSnapshot.from_page(x)
+
+        if snapshot.text is None:
+            print("Failed to get content for pageid: " + str(x["pageid"]))
+            continue
+        yield snapshot
+
+
+transforms = TransformPool(transform, timeout=args.timeout)
+
+
+def jobs() -> Iterator[EditJob]:
+    """Transform the pages in a process pool and create their edit jobs."""
+    for t in transforms.map(fetched()):
+        if not t.ok:
+            print(
+                "Failed to transform pageid: " + str(t.page.pageid) + " " + str(t.error)
+            )
+            journal.mark(t.page.pageid, JobJournal.FAILED, str(t.error))
+            continue
+
+        yield EditJob(
+            method="modify",
+            kwargs={
+                "transform": transform,
+                "transformed": t.result,
+                "base": t.page,
+                "suppressAbuseFilter": True,
+                "bot": True,
+                "minor": True,
+                "summary": "分类替换：【" + before + "】→【" + after + "】",
+                "tags": "Bot",
+            },
         )
-    )
 
-    print("Finished: " + str(x["pageid"]))
+
+editor = BulkEditor(
+    api,
+    workers=args.workers,
+    max_rate=args.max_rate,
+    error_log="error.log",
+    journal=journal,
+)
+for result in editor.run(jobs()):
+    if result.ok:
+        print("Finished: " + str(result.job.target) + " " + str(result.result))
+    else:
+        print("Failed: " + str(result.job.target) + " " + str(result.error))
+
+print(
+    f"Done: {editor.succeeded} edited, {editor.failed} failed, "
+    f"{api.edits_skipped} unchanged, {transforms.failed} failed to transform."
+)
+cache.close()
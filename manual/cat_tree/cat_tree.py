@@ -1,31 +1,127 @@
-"""Get the category tree of a category."""
+"""Get the category tree of a category.
+
+The tree is crawled level by level, with the categories of each level
+fetched concurrently. Only subcategories are listed, while the pages and
+files in each category are counted with categoryinfo. Each category is
+crawled once however many parents it has, so shared subcategories and
+cycles are handled. The tree is saved to cat-tree.json, and indexed in
+cat-tree.sqlite for CategoryGraph queries.
+"""
+import argparse
 import json
-from collections import deque
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from catgraph import CategoryGraph
 
 from mwapi import MwApi
 
-api = MwApi()
-api.login_with_config("passwords.py", "zh")
+parser = argparse.ArgumentParser()
+parser.add_argument("--workers", type=int, default=8, help="concurrent requests")
+parser.add_argument("--depth", type=int, help="levels below the root to crawl")
+args = parser.parse_args()
+
+api = MwApi(pool_size=args.workers)
+api.login_with_config("passwords.py", "zh", "session.json")
 print("Logged in")
 
 ROOT = "追踪分类"
 ROOT_ID = 176083
 
-output = {}
-q = deque([(ROOT, ROOT_ID)])
-while q:
-    title, pageid = q.popleft()
-    pages = api.list_category_members(pageid=pageid, cmprop="ids|title|type")
-    subcats = []
-    SUBPAGE = 0
-    for page in pages:
-        if page["type"] == "subcat":
-            q.append((page["title"], page["pageid"]))
-            subcats.append(page["pageid"])
-        else:
-            SUBPAGE += 1
-    output[pageid] = {"title": title, "subcats": subcats, "subpage": SUBPAGE}
+
+def subcategories(pageid: int) -> list[tuple[str, int]]:
+    """Get the subcategories of a category."""
+    return [
+        (page["title"], page["pageid"])
+        for page in api.iter_category_members(
+            pageid=pageid, cmprop="ids|title", cmtype="subcat"
+        )
+    ]
+
+
+def counts(pageids: list[int]) -> dict[str | int, Any]:
+    """Get the member counts of a batch of categories."""
+    return api.get_category_info(pageids=pageids)
+
+
+def find_cycles(tree: dict[int, Any]) -> list[tuple[int, int]]:
+    """Find the edges that close a cycle, by a depth-first search from the root."""
+    # 1: on the current path, 2: done
+    state: dict[int, int] = {}
+    back = []
+    stack = [(ROOT_ID, iter(tree[ROOT_ID]["subcats"]))]
+    state[ROOT_ID] = 1
+    while stack:
+        node, children = stack[-1]
+        child: Optional[int] = next(children, None)
+        if child is None:
+            state[node] = 2
+            stack.pop()
+        elif child not in tree:
+            continue
+        elif state.get(child) == 1:
+            back.append((node, child))
+        elif child not in state:
+            state[child] = 1
+            stack.append((child, iter(tree[child]["subcats"])))
+    return back
+
+
+output: dict[int, Any] = {}
+frontier = [(ROOT, ROOT_ID)]
+seen = {ROOT_ID}
+depth = 0
+start = time.monotonic()
+with ThreadPoolExecutor(args.workers) as pool:
+    while frontier and (args.depth is None or depth <= args.depth):
+        level = time.monotonic()
+        ids = [pageid for _, pageid in frontier]
+        batches = [
+            ids[i : i + api.batch_size] for i in range(0, len(ids), api.batch_size)
+        ]
+        infos = pool.map(counts, batches)
+        members = pool.map(subcategories, ids)
+        info: dict[str | int, Any] = {}
+        for batch in infos:
+            info.update(batch)
+
+        following = []
+        for (title, pageid), subcats in zip(frontier, members):
+            output[pageid] = {
+                "title": title,
+                "subcats": [i for _, i in subcats],
+                "subpage": info[pageid]["pages"] + info[pageid]["files"],
+                "depth": depth,
+            }
+            for subcat in subcats:
+                if subcat[1] not in seen:
+                    seen.add(subcat[1])
+                    following.append(subcat)
+
+        elapsed = time.monotonic() - level
+        print(
+            f"Depth {depth}: {len(frontier)} categories in {elapsed:.2f}s, "
+            f"{len(following)} new subcategories"
+        )
+        frontier = following
+        depth += 1
+
+elapsed = time.monotonic() - start
+print(
+    f"Crawled {len(output)} categories in {elapsed:.2f}s "
+    f"({len(output) / elapsed:.1f} categories/s)"
+)
+if frontier:
+    print(f"Stopped at depth {args.depth}, {len(frontier)} categories not crawled")
+for parent, child in find_cycles(output):
+    print(f"Cycle: {output[parent]['title']} -> {output[child]['title']}")
 
 # save output to JSON file
 with open("cat-tree.json", "w", encoding="utf-8") as f:
     json.dump(output, f, ensure_ascii=False)
+
+# index the tree for descendant and ancestor queries
+graph = CategoryGraph("cat-tree.sqlite")
+graph.build(output)
+graph.close()
@@ -0,0 +1,172 @@
+"""An on-disk index of a category tree.
+
+The tree crawled by cat_tree is stored in SQLite with a closure table,
+which holds the shortest distance from every category to each of its
+descendants. Descendants, ancestors and depths are then single indexed
+queries, and the database is opened without loading the tree into memory.
+
+  Typical usage example:
+
+  graph = CategoryGraph("cat-tree.sqlite")
+  for pageid in graph.descendants(graph.find("追踪分类")):
+      print(graph.title(pageid))
+"""
+import sqlite3
+from collections import deque
+from typing import Any, Mapping, Optional
+
+
+class CategoryGraph:
+    """A category tree with its transitive closure, stored in SQLite."""
+
+    def __init__(self, path: str = "cat-tree.sqlite") -> None:
+        self.__db = sqlite3.connect(path)
+        self.__db.executescript(
+            "CREATE TABLE IF NOT EXISTS categories ("
+            "pageid INTEGER PRIMARY KEY, title TEXT NOT NULL, "
+            "subpage INTEGER NOT NULL, depth INTEGER);"
+            "CREATE INDEX IF NOT EXISTS categories_title ON categories (title);"
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "parent INTEGER NOT NULL, child INTEGER NOT NULL, "
+            "PRIMARY KEY (parent, child)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS edges_child ON edges (child, parent);"
+            "CREATE TABLE IF NOT EXISTS closure ("
+            "ancestor INTEGER NOT NULL, descendant INTEGER NOT NULL, "
+            "distance INTEGER NOT NULL, "
+            "PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS closure_descendant "
+            "ON closure (descendant, ancestor, distance);"
+        )
+        self.__db.commit()
+
+    def build(self, tree: Mapping[Any, Mapping[str, Any]]) -> None:
+        """Replace the stored tree with one in the format of cat-tree.json."""
+        # The JSON file has string keys, while a fresh crawl has integers
+        tree = {int(pageid): node for pageid, node in tree.items()}
+        children = {
+            pageid: [int(c) for c in node["subcats"] if int(c) in tree]
+            for pageid, node in tree.items()
+        }
+
+        with self.__db:
+            self.__db.execute("DELETE FROM categories")
+            self.__db.execute("DELETE FROM edges")
+            self.__db.execute("DELETE FROM closure")
+            self.__db.executemany(
+                "INSERT INTO categories VALUES (?, ?, ?, ?)",
+                (
+                    (pageid, node["title"], node["subpage"], node.get("depth"))
+                    for pageid, node in tree.items()
+                ),
+            )
+            self.__db.executemany(
+                "INSERT OR IGNORE INTO edges VALUES (?, ?)",
+                ((parent, child) for parent, cs in children.items() for child in cs),
+            )
+            for pageid in children:
+                self.__db.executemany(
+                    "INSERT INTO closure VALUES (?, ?, ?)",
+                    (
+                        (pageid, descendant, distance)
+                        for descendant, distance in self.__bfs(children, pageid)
+                    ),
+                )
+
+    @staticmethod
+    def __bfs(children: dict[int, list[int]], start: int) -> list[tuple[int, int]]:
+        """Find the descendants of a category and their shortest distance."""
+        distances = {start: 0}
+        q = deque([start])
+        while q:
+            node = q.popleft()
+            for child in children.get(node, []):
+                if child not in distances:
+                    distances[child] = distances[node] + 1
+                    q.append(child)
+        del distances[start]
+        return list(distances.items())
+
+    def find(self, title: str) -> Optional[int]:
+        """Get the pageid of a category by its title."""
+        row = self.__db.execute(
+            "SELECT pageid FROM categories WHERE title = ?", (title,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def title(self, pageid: int) -> Optional[str]:
+        """Get the title of a category."""
+        row = self.__db.execute(
+            "SELECT title FROM categories WHERE pageid = ?", (pageid,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def depth(self, pageid: int) -> Optional[int]:
+        """Get the depth of a category below the root of the crawl."""
+        row = self.__db.execute(
+            "SELECT depth FROM categories WHERE pageid = ?", (pageid,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def children(self, pageid: int) -> list[int]:
+        """Get the direct subcategories of a category."""
+        rows = self.__db.execute("SELECT child FROM edges WHERE parent = ?", (pageid,))
+        return [row[0] for row in rows]
+
+    def parents(self, pageid: int) -> list[int]:
+        """Get the categories that directly contain a category."""
+        rows = self.__db.execute("SELECT parent FROM edges WHERE child = ?", (pageid,))
+        return [row[0] for row in rows]
+
+    def descendants(self, pageid: int, max_depth: Optional[int] = None) -> list[int]:
+        """Get the subcategories of a category at any depth, nearest first."""
+        limit = "" if max_depth is None else f" AND distance <= {int(max_depth)}"
+        rows = self.__db.execute(
+            "SELECT descendant FROM closure WHERE ancestor = ?"
+            + limit
+            + " ORDER BY distance, descendant",
+            (pageid,),
+        )
+        return [row[0] for row in rows]
+
+    def ancestors(self, pageid: int) -> list[int]:
+        """Get the categories containing a category at any depth, nearest first."""
+        rows = self.__db.execute(
+            "SELECT ancestor FROM closure WHERE descendant = ? "
+            "ORDER BY distance, ancestor",
+            (pageid,),
+        )
+        return [row[0] for row in rows]
+
+    def distance(self, ancestor: int, descendant: int) -> Optional[int]:
+        """Get the number of levels between a category and a descendant."""
+        if ancestor == descendant:
+            return 0
+        row = self.__db.execute(
+            "SELECT distance FROM closure WHERE ancestor = ? AND descendant = ?",
+            (ancestor, descendant),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def path(self, ancestor: int, descendant: int) -> Optional[list[int]]:
+        """Get a shortest chain of subcategories from a category to another."""
+        distance = self.distance(ancestor, descendant)
+        if distance is None:
+            return None
+
+        path = [descendant]
+        while distance > 0:
+            # A parent one level closer to the ancestor is on a shortest path
+            row = self.__db.execute(
+                "SELECT e.parent FROM edges e "
+                "LEFT JOIN closure c ON c.ancestor = ? AND c.descendant = e.parent "
+                "WHERE e.child = ? AND COALESCE(c.distance, "
+                "CASE WHEN e.parent = ? THEN 0 END) = ? LIMIT 1",
+                (ancestor, path[-1], ancestor, distance - 1),
+            ).fetchone()
+            path.append(row[0])
+            distance -= 1
+        return path[::-1]
+
+    def close(self) -> None:
+        """Close the database."""
+        self.__db.close()
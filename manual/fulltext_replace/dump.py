@@ -0,0 +1,113 @@
+"""Find the pages of an XML dump that the replacement rules match.
+
+Dumps are read as a stream, optionally compressed with bz2 or gzip, and
+pages are dropped as soon as they are parsed, so memory use does not grow
+with the size of the dump. Matching runs in a pool of forked processes,
+as the script using this module has no __main__ guard for spawned ones.
+"""
+import bz2
+import gzip
+import multiprocessing
+import os
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Container, Iterator, Optional
+
+from replace import RuleSet, clean
+
+# Text of pages sent to a worker at once, in characters
+CHUNK_SIZE = 4 * 2**20
+
+rules: Optional[RuleSet] = None
+
+
+def open_dump(path: str) -> IO[bytes]:
+    """Open a dump, decompressing it by its extension."""
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_pages(
+    path: str, namespaces: Optional[Container[int]] = None
+) -> Iterator[tuple[int, str]]:
+    """Iterate over the pageid and latest text of each page in a dump."""
+    with open_dump(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or elem.tag.rpartition("}")[2] != "page":
+                continue
+
+            pageid = ns = None
+            text = ""
+            for child in elem:
+                tag = child.tag.rpartition("}")[2]
+                if tag == "id":
+                    pageid = int(child.text or 0)
+                elif tag == "ns":
+                    ns = int(child.text or 0)
+                elif tag == "revision":
+                    # The last revision in a page is the latest one
+                    for c in child:
+                        if c.tag.rpartition("}")[2] == "text":
+                            text = c.text or ""
+            # Drop the page and any earlier siblings kept by the root
+            root.clear()
+
+            if pageid is None:
+                continue
+            if namespaces is not None and ns not in namespaces:
+                continue
+            yield pageid, text
+
+
+def init(ruleset: RuleSet) -> None:
+    """Set the rules in a worker process."""
+    global rules  # pylint: disable=global-statement
+    rules = ruleset
+
+
+def match(chunk: list[tuple[int, str]]) -> list[int]:
+    """Return the pageids of the pages in a chunk that the rules match."""
+    assert rules is not None
+    return [pageid for pageid, text in chunk if rules.search(clean(text))]
+
+
+def scan(
+    path: str,
+    ruleset: RuleSet,
+    namespaces: Optional[Container[int]] = None,
+    workers: Optional[int] = None,
+) -> Iterator[int]:
+    """Yield the pageids of the pages in a dump that the rules match, in order."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=init,
+        initargs=(ruleset,),
+    ) as pool:
+        # Only a few chunks are parsed ahead of the workers
+        limit = 2 * workers
+        pending: deque[Future[list[int]]] = deque()
+
+        chunk: list[tuple[int, str]] = []
+        size = 0
+        for pageid, text in iter_pages(path, namespaces):
+            chunk.append((pageid, text))
+            size += len(text)
+            if size < CHUNK_SIZE:
+                continue
+            pending.append(pool.submit(match, chunk))
+            chunk, size = [], 0
+            while len(pending) >= limit:
+                yield from pending.popleft().result()
+
+        if chunk:
+            pending.append(pool.submit(match, chunk))
+        while pending:
+            yield from pending.popleft().result()
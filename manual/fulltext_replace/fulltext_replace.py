@@ -1,62 +1,136 @@
-"""Replace text in all pages that match a query."""
+"""Replace text in all pages that match a query.
+
+The config has either a single before, after and isRegEx, or a list of
+rules with those keys, which are all applied in one pass over the pages.
+Candidates are found with the search query, or by scanning the XML dump at
+the path given as dump, which finds every match instead of those the
+search index knows of. Pages are transformed in a pool of processes, and
+a page that takes longer than timeout seconds (60 by default) is skipped.
+Set limit to stop after that many edits, e.g. 1 to try out new rules.
+"""
 import ast
-import re
 import sys
+from typing import Iterator
+
+from dump import scan
+from replace import RuleSet, clean
 
-from mwapi import MwApi
+from mwapi import JobJournal, MwApi, PageCache, PageSnapshot, TransformPool
 
 with open("config.py", "r", encoding="utf-8") as f:
     CONFIG = ast.literal_eval(f.read())
 
-api = MwApi()
-api.login_with_config("passwords.py", CONFIG["site"])
+cache = PageCache("cache.sqlite")
+api = MwApi(cache=cache, skip_unchanged=True)
+api.login_with_config("passwords.py", CONFIG["site"], "session.json")
 print("Logged in")
 
-before = CONFIG["before"]
-after = CONFIG["after"]
-isRegEx = CONFIG["isRegEx"]
+rules = RuleSet.from_config(CONFIG)
 query = CONFIG["query"]
 namespace = CONFIG["namespace"]
 
-pages = api.search(query, srprop="", srnamespace=namespace)
-print(pages)
-print("Got list of pages.")
+# Hits of each rule in all edited pages
+total = [0] * len(rules.rules)
+edits = 0
 
-for x in pages:
-    print("Working on: " + str(x["pageid"]))
-    content = api.get_content(pageid=x["pageid"])
 
-    if content is None:
-        print("Page does not exist, skipping...")
-        continue
+def apply(content: str) -> tuple[str, list[int]]:
+    """Clean up the content, apply the rules and count their hits."""
+    return rules.apply(clean(content))
+
+
+def transform(content: str) -> str:
+    """Clean up the content and apply the rules."""
+    return apply(content)[0]
+
+
+journal = JobJournal("journal.sqlite", query + ": " + str(rules))
+edited = {int(k) for k in journal.keys(JobJournal.EDITED)}
+
+
+def fetch(pageids: list[int]) -> Iterator[PageSnapshot]:
+    """Fetch the latest revision of pages that exist."""
+    # A matching redirect is edited itself, not swapped for its target
+    pages = api.get_pages(pageids=pageids, redirects=False)
+    return (page for page in pages.values() if page)
+
 
-    # Remove random unicode character
-    content = re.sub(
-        r"[\u1680\u180E\u2000-\u200B\u200E\u200F\u2028-\u202F\u205F]+", "", content
-    )
-    content = re.sub(r"([^\xA0])\xA0([^\xA0])", r"\1 \2", content)
+def candidates() -> Iterator[PageSnapshot]:
+    """Fetch the latest revision of the pages that may need replacing."""
+    if "dump" not in CONFIG:
+        # Search continues by offset, and edited pages drop out of the
+        # results, so every match is listed before any page is edited
+        pageids = [
+            item["pageid"]
+            for item in api.iter_search(query, srnamespace=namespace, srprop="")
+            if item["pageid"] not in edited
+        ]
+        for i in range(0, len(pageids), api.batch_size):
+            yield from fetch(pageids[i : i + api.batch_size])
+        return
 
-    if isRegEx:
-        content = re.sub(before, after, content, flags=re.I | re.S)
-    else:
-        content = content.replace(before, after)
+    namespaces = {int(ns) for ns in str(namespace).split("|")}
+    batch: list[int] = []
+    for pageid in scan(CONFIG["dump"], rules, namespaces, CONFIG.get("workers")):
+        if pageid not in edited:
+            batch.append(pageid)
+        if len(batch) >= api.batch_size:
+            yield from fetch(batch)
+            batch = []
+    if batch:
+        yield from fetch(batch)
+
+
+def fetched() -> Iterator[PageSnapshot]:
+    """Yield the candidates that exist, marking them as fetched."""
+    for snapshot in candidates():
+        print("Working on: " + str(snapshot.pageid))
+
+        if snapshot.text is None:
+            print("Page does not exist, skipping...")
+            continue
+        journal.mark(snapshot.pageid, JobJournal.FETCHED)
+        yield snapshot
+
+
+transforms = TransformPool(apply, timeout=CONFIG.get("timeout", 60))
+
+for t in transforms.map(fetched()):
+    snapshot = t.page
+    if not t.ok:
+        print(t.error)
+        journal.mark(snapshot.pageid, JobJournal.FAILED, str(t.error))
+        continue
+    content, hits = t.result
 
     try:
         print(
-            api.replace(
-                pageid=x["pageid"],
-                text=content,
+            api.modify(
+                transform=transform,
+                transformed=content,
+                base=snapshot,
                 suppressAbuseFilter=True,
                 bot=True,
                 minor=True,
-                summary="文本替换：【" + before + "】→【" + after + "】",
+                summary="文本替换：" + str(rules),
                 tags="Bot",
             )
         )
-        break
+        journal.mark(snapshot.pageid, JobJournal.EDITED)
+        total = [n + h for n, h in zip(total, hits)]
+        edits += 1
     except KeyboardInterrupt:
         sys.exit(1)
     except BaseException as e:  # pylint: disable=broad-except
         print(e)
+        journal.mark(snapshot.pageid, JobJournal.FAILED, f"{type(e).__name__}: {e}")
+
+    print("Finished: " + str(snapshot.pageid))
+    if edits == CONFIG.get("limit"):
+        print(f"Stopping after {edits} edits.")
+        break
 
-    print("Finished: " + str(x["pageid"]))
+print(f"Skipped {api.edits_skipped} edits that would not change the page.")
+for rule, count in zip(rules.rules, total):
+    print(f"{rule}: {count} hits")
+cache.close()
@@ -0,0 +1,117 @@
+"""Apply many replacement rules to a text in a single scan."""
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+# Random unicode characters removed before replacing
+INVISIBLE = re.compile(r"[\u1680\u180E\u2000-\u200B\u200E\u200F\u2028-\u202F\u205F]+")
+# A single non-breaking space between two other characters
+NBSP = re.compile(r"([^\xA0])\xA0([^\xA0])")
+# Backreferences, named groups and global flags break an alternation
+STANDALONE = re.compile(r"\\[1-9]|\(\?P[<=]|^\(\?[aiLmsux]+\)")
+
+
+def clean(content: str) -> str:
+    """Remove random unicode characters and stray non-breaking spaces."""
+    return NBSP.sub(r"\1 \2", INVISIBLE.sub("", content))
+
+
+@dataclass
+class Rule:
+    """A replacement of a literal text or a regular expression.
+
+    Regular expressions are case-insensitive and their dot matches newlines.
+    Replacements of regular expressions may use group references.
+    """
+
+    before: str
+    after: str
+    isRegEx: bool = False
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "Rule":
+        """Build a rule from a config entry with before, after and isRegEx."""
+        return cls(config["before"], config["after"], config.get("isRegEx", False))
+
+    @property
+    def source(self) -> str:
+        """Return the pattern of the rule as a regular expression."""
+        if self.isRegEx:
+            return "(?is:" + self.before + ")"
+        return re.escape(self.before)
+
+    def compile(self) -> re.Pattern[str]:
+        """Compile the rule on its own."""
+        if self.isRegEx:
+            return re.compile(self.before, re.I | re.S)
+        return re.compile(re.escape(self.before))
+
+    def __str__(self) -> str:
+        return "【" + self.before + "】→【" + self.after + "】"
+
+
+class RuleSet:
+    """A set of rules compiled into a single alternation.
+
+    All rules are applied to the original text in one scan, so the output
+    of a rule is never matched by another rule. Where several rules match at
+    the same position, the first one in the list wins. Rules that cannot be
+    part of an alternation (with backreferences, named groups or global
+    flags) are applied one after another after the scan.
+    """
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules = list(rules)
+        self.__compiled = [rule.compile() for rule in self.rules]
+
+        self.__combined: list[int] = []
+        self.__standalone: list[int] = []
+        for i, rule in enumerate(self.rules):
+            if rule.isRegEx and STANDALONE.search(rule.before):
+                self.__standalone.append(i)
+            else:
+                self.__combined.append(i)
+
+        self.__pattern: Optional[re.Pattern[str]] = None
+        if self.__combined:
+            self.__pattern = re.compile(
+                "|".join(f"(?P<r{i}>{self.rules[i].source})" for i in self.__combined)
+            )
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "RuleSet":
+        """Build the rules from a config with rules or a single before and after."""
+        if "rules" in config:
+            return cls(Rule.from_config(rule) for rule in config["rules"])
+        return cls([Rule.from_config(config)])
+
+    def __str__(self) -> str:
+        return "；".join(str(rule) for rule in self.rules)
+
+    def search(self, content: str) -> bool:
+        """Check if any rule matches the content."""
+        if self.__pattern is not None and self.__pattern.search(content):
+            return True
+        return any(self.__compiled[i].search(content) for i in self.__standalone)
+
+    def apply(self, text: str) -> tuple[str, list[int]]:
+        """Apply all rules to the text and count the hits of each rule."""
+        hits = [0] * len(self.rules)
+
+        def replace(match: re.Match[str]) -> str:
+            # The group of the rule closes last, after any groups inside it
+            i = int((match.lastgroup or "r")[1:])
+            hits[i] += 1
+            rule = self.rules[i]
+            if not rule.isRegEx:
+                return rule.after
+            # Match again with the rule alone so group references are its own
+            own = self.__compiled[i].match(text, match.start())
+            return own.expand(rule.after) if own is not None else match.group()
+
+        content = text
+        if self.__pattern is not None:
+            content = self.__pattern.sub(replace, content)
+        for i in self.__standalone:
+            content, hits[i] = self.__compiled[i].subn(self.rules[i].after, content)
+        return content, hits
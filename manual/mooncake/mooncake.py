@@ -5,10 +5,14 @@ import ast
 import re
 import sys
 
-from mwapi import MwApi
+from mwapi import BulkEditor, EditJob, JobJournal, MwApi
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--dry", action="store_true", help="dry run")
+parser.add_argument("--workers", type=int, default=4, help="concurrent edits")
+parser.add_argument(
+    "--max-rate", type=float, default=60, help="edits per minute, 0 for no limit"
+)
 args = parser.parse_args()
 
 ZHNUM = {
@@ -52,14 +56,15 @@ def to_zh_num(o: int) -> str:
 with open("config.py", "r", encoding="utf-8") as f:
     CONFIG = ast.literal_eval(f.read())
 
-with open("ignore.txt", "r", encoding="utf-8") as f:
-    IGNORE = set(f.read().splitlines())
-
 if CONFIG["month"] not in ZHMO:
     raise ValueError("Invalid month")
 
+# Each issue is a separate job, so a rerun only delivers what is missing
+journal = JobJournal("journal.sqlite", f'{CONFIG["year"]}-{CONFIG["month"]}')
+DELIVERED = journal.keys(JobJournal.EDITED)
+
 api = MwApi()
-api.login_with_config("passwords.py", "zh")
+api.login_with_config("passwords.py", "zh", "session.json")
 print("Logged in")
 
 YEAR_ZH = to_zh_num(CONFIG["year"])
@@ -70,25 +75,31 @@ if not res:
     sys.exit(1)
 
 subList = res.splitlines()
-with open("ignore.txt", "a", encoding="utf-8") as f:
-    for line in subList:
-        if not line.startswith("#"):
-            print(f"{line} ignored")
-            continue
-        target = re.search(r"\[\[(.*?)\]\]", line)
-        if target is None:
-            print(f"{line} ignored")
-            continue
-        target = target.group(1)
-        print(f"{line} -> {target}")
-        if target in IGNORE:
-            print(f"{target} ignored")
-            continue
-        if args.dry:
-            continue
-        api.append(
-            page=target,
-            text=(
+targets = []
+for line in subList:
+    if not line.startswith("#"):
+        print(f"{line} ignored")
+        continue
+    target = re.search(r"\[\[(.*?)\]\]", line)
+    if target is None:
+        print(f"{line} ignored")
+        continue
+    target = target.group(1)
+    print(f"{line} -> {target}")
+    if target in DELIVERED:
+        print(f"{target} already delivered")
+        continue
+    targets.append(target)
+
+if args.dry:
+    sys.exit(0)
+
+jobs = (
+    EditJob(
+        target,
+        "append",
+        {
+            "text": (
                 "\n{{subst:U:Eizenchan/mooncake"
                 f'|foreword={str(CONFIG["foreword"])}'
                 f'|year={str(CONFIG["year"])}'
@@ -97,13 +108,29 @@ with open("ignore.txt", "a", encoding="utf-8") as f:
                 f"|month-zh={MONTH_ZH}"
                 "}}"
             ),
-            summary="您点的月饼已送达，不要忘了给我们五星好评噢～",
-            tags="Bot",
-            bot=True,
-            timeout=60,
-        )
-        f.write(f"{target}\n")
-
-if not args.dry:
-    with open("ignore.txt", "w", encoding="utf-8") as f:
-        f.write("")
+            "summary": "您点的月饼已送达，不要忘了给我们五星好评噢～",
+            "tags": "Bot",
+            "bot": True,
+            "timeout": 60,
+        },
+    )
+    for target in targets
+)
+
+journal.plan(targets)
+editor = BulkEditor(
+    api,
+    workers=args.workers,
+    max_rate=args.max_rate,
+    error_log="error.log",
+    journal=journal,
+)
+for result in editor.run(jobs):
+    if result.ok:
+        print(f"{result.job.target} delivered")
+    else:
+        print(f"{result.job.target} failed: {result.error}")
+
+if editor.failed:
+    print(f"{editor.failed} deliveries failed, see error.log")
+    sys.exit(1)
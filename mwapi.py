@@ -12,18 +12,52 @@ custom invocation is also possible.
 """
 
 import ast
+import atexit
+import bisect
+import email.utils
+import hashlib
+import json
+import multiprocessing
+import os
+import random
 import re
+import sqlite3
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.pool import AsyncResult, Pool
 from os import PathLike
-from typing import Any, Optional, cast
+from typing import Any, Callable, Container, Iterable, Iterator, Mapping, Optional, cast
 
 import requests
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 APIDict = dict[str, Any]
 FileDescriptorOrPath = int | str | bytes | PathLike[str] | PathLike[bytes]
 
 
+def loads(data: bytes) -> Any:
+    """Decode a JSON response body, using orjson if it is installed.
+
+    The API always answers in UTF-8, so the bytes are decoded directly
+    instead of guessing their charset.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects lone surrogates, which page text may contain
+            pass
+    return json.loads(data)
+
+
 class APIError(Exception):
     """Base class for API errors."""
 
@@ -56,6 +90,23 @@ class FormatError(Exception):
         super().__init__("Response format not recognised")
 
 
+class EditConflictError(APIError):
+    """Raised when a page was changed after the base revision of an edit."""
+
+    def __init__(self, page: Optional[str | int]) -> None:
+        self.page = page
+        super().__init__("Edit conflict: " + str(page), "editconflict")
+
+
+class TransformTimeoutError(Exception):
+    """Raised when transforming the text of a page takes too long."""
+
+    def __init__(self, page: Optional[str | int], timeout: float) -> None:
+        self.page = page
+        self.timeout = timeout
+        super().__init__(f"Transform timed out after {timeout}s: {page}")
+
+
 class LoginError(Exception):
     """Raised when login fails."""
 
@@ -63,15 +114,536 @@ class LoginError(Exception):
         super().__init__("Not logged in")
 
 
-class MwApi:
-    """A class for connecting to MediaWiki API."""
+class RetryPolicy:
+    """Decide whether and when to retry a failed request.
+
+    Failed attempts are retried with exponential backoff and jitter, or
+    after the delay hinted by the server (Retry-After or the reported lag).
+    Each request may be retried up to retries times, and all requests of
+    an instance together up to budget times if a budget is set. Subclass
+    and override should_retry or delay to change the policy.
+
+    A POST that may have been acted on, e.g. an edit whose response timed
+    out, is not retried. POST requests are only retried on the error codes,
+    on post_statuses with a Retry-After header, or on connect timeouts.
+    """
+
+    statuses = {429, 502, 503, 504}
+    post_statuses = {429, 503}
+    codes = {"maxlag", "ratelimited", "readonly"}
+
+    def __init__(
+        self,
+        retries: int = 5,
+        *,
+        backoff: float = 1,
+        max_delay: float = 60,
+        jitter: float = 0.5,
+        budget: Optional[int] = None,
+        maxlag: Optional[int] = 5,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = budget
+        self.maxlag = maxlag
+        self.__lock = threading.Lock()
+
+    def should_retry(self, attempt: int) -> bool:
+        """Check if the given failed attempt (counted from 0) can be retried."""
+        if attempt >= self.retries:
+            return False
+        if self.budget is not None:
+            with self.__lock:
+                if self.budget <= 0:
+                    return False
+                self.budget -= 1
+        return True
+
+    def delay(self, attempt: int, hint: Optional[float] = None) -> float:
+        """Get the number of seconds to wait before retrying an attempt."""
+        if hint is None:
+            hint = self.backoff * 2**attempt
+        delay = min(hint, self.max_delay)
+        return delay + random.uniform(0, delay * self.jitter)
+
+    @staticmethod
+    def hint(
+        headers: Mapping[str, str], res: Optional[APIDict] = None
+    ) -> Optional[float]:
+        """Get the delay requested by the server, if any."""
+        header = headers.get("Retry-After")
+        if header is not None:
+            if header.isdigit():
+                return float(header)
+            try:
+                when = email.utils.parsedate_to_datetime(header)
+            except (TypeError, ValueError):
+                return None
+            return max(0.0, when.timestamp() - time.time())
+        if res is not None and "lag" in res.get("error", {}):
+            return float(res["error"]["lag"])
+        return None
+
+
+@dataclass(frozen=True)
+class PageSnapshot:
+    """The latest revision of a page, as the base of a read-modify-write."""
+
+    title: str
+    pageid: Optional[int]
+    text: Optional[str]
+    revid: Optional[int]
+    timestamp: Optional[str]
+    sha1: Optional[str] = None
+    size: Optional[int] = None
+
+    @classmethod
+    def from_page(cls, page: APIDict) -> "PageSnapshot":
+        """Build a snapshot from a page object with its revision and content."""
+        rev = page.get("revisions", [{}])[0]
+        return cls(
+            title=page["title"],
+            pageid=page.get("pageid"),
+            text=MwApi.page_content(page) if "slots" in rev or "*" in rev else None,
+            revid=rev.get("revid"),
+            timestamp=rev.get("timestamp"),
+            sha1=rev.get("sha1"),
+            size=rev.get("size"),
+        )
+
+    def unchanged_by(self, text: str) -> bool:
+        """Check if saving text on top of this revision would be a null edit.
+
+        The text is compared by SHA-1 with the revision, using its sha1 if
+        it was fetched or else its text.
+        """
+        sha1 = self.sha1
+        if sha1 is None and self.text is not None:
+            sha1 = hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+        if self.revid is None or sha1 is None:
+            return False
+        # MediaWiki normalizes newlines and strips trailing whitespace on save
+        text = text.replace("\r\n", "\n")
+        return any(
+            hashlib.sha1(t.encode("utf-8")).hexdigest() == sha1
+            for t in (text, text.rstrip())
+        )
+
+
+@dataclass
+class RequestEvent:
+    """A single attempt of a request, as seen by request hooks.
+
+    Pre-request hooks see the method, parameters and attempt number. Post-
+    request hooks are also given the outcome: the elapsed time, the HTTP
+    status, bytes sent and received, the error (an API error code, an HTTP
+    status, "timeout" or "connection"), whether it will be retried and the
+    database lag reported by the server.
+    """
+
+    method: str
+    params: APIDict
+    attempt: int = 0
+    start: float = field(default_factory=time.monotonic)
+    elapsed: Optional[float] = None
+    status: Optional[int] = None
+    sent: int = 0
+    received: int = 0
+    error: Optional[str] = None
+    retry: bool = False
+    lag: Optional[float] = None
+
+    @property
+    def action(self) -> str:
+        """The action of the request."""
+        return str(self.params.get("action", ""))
+
+    @property
+    def module(self) -> str:
+        """The list, prop, generator and meta modules of a query request."""
+        names = []
+        for key in ("list", "prop", "generator", "meta"):
+            if self.params.get(key):
+                names.append(f"{key}={self.params[key]}")
+        return "&".join(names)
+
+
+class MetricsCollector:
+    """Collect request metrics from MwApi hooks and export them.
+
+    Requests are grouped by action and query modules. For each group the
+    collector records a latency histogram, request and response bytes,
+    retries, timeouts and errors by code, and the server-reported lag.
+    """
+
+    buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.started = time.time()
+        self.groups: dict[tuple[str, str], APIDict] = {}
+        self.lag: Optional[float] = None
+        self.max_lag: Optional[float] = None
+
+    def attach(self, api: "MwApi") -> None:
+        """Record the requests of an MwApi instance."""
+        api.post_hooks.append(self.record)
+
+    def record(self, event: RequestEvent) -> None:
+        """Record a finished request attempt."""
+        key = (event.action, event.module)
+        with self.__lock:
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = {
+                    "requests": 0,
+                    "seconds": 0.0,
+                    "buckets": [0] * (len(self.buckets) + 1),
+                    "sent": 0,
+                    "received": 0,
+                    "retries": 0,
+                    "timeouts": 0,
+                    "errors": {},
+                }
+            group["requests"] += 1
+            elapsed = event.elapsed or 0.0
+            group["seconds"] += elapsed
+            group["buckets"][bisect.bisect_left(self.buckets, elapsed)] += 1
+            group["sent"] += event.sent
+            group["received"] += event.received
+            group["retries"] += event.retry
+            group["timeouts"] += event.error == "timeout"
+            if event.error is not None:
+                group["errors"][event.error] = group["errors"].get(event.error, 0) + 1
+            if event.lag is not None:
+                self.lag = event.lag
+                self.max_lag = max(self.max_lag or 0.0, event.lag)
+
+    def summary(self) -> APIDict:
+        """Get a JSON-serializable summary of the recorded requests."""
+        with self.__lock:
+            groups = []
+            for (action, module), group in sorted(self.groups.items()):
+                histogram = dict(
+                    zip([str(b) for b in self.buckets] + ["+Inf"], group["buckets"])
+                )
+                groups.append(
+                    {
+                        "action": action,
+                        "module": module,
+                        **{k: v for k, v in group.items() if k != "buckets"},
+                        "errors": dict(group["errors"]),
+                        "histogram": histogram,
+                    }
+                )
+            return {
+                "started": self.started,
+                "duration": time.time() - self.started,
+                "requests": sum(g["requests"] for g in self.groups.values()),
+                "lag": self.lag,
+                "max_lag": self.max_lag,
+                "groups": groups,
+            }
 
-    __s = requests.Session()
+    def prometheus(self, prefix: str = "mwapi") -> str:
+        """Format the recorded requests in the Prometheus text format."""
+        summary = self.summary()
+        lines = []
+        counters = [
+            ("requests", "requests", "Requests sent, including retries."),
+            ("request_bytes", "sent", "Bytes of requests sent."),
+            ("response_bytes", "received", "Bytes of responses received."),
+            ("retries", "retries", "Requests that were retried."),
+            ("timeouts", "timeouts", "Requests that timed out."),
+        ]
+        for name, key, text in counters:
+            lines.append(f"# HELP {prefix}_{name}_total {text}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for group in summary["groups"]:
+                labels = self.__labels(group)
+                lines.append(f"{prefix}_{name}_total{{{labels}}} {group[key]}")
+
+        lines.append(f"# HELP {prefix}_errors_total Responses with an error.")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for group in summary["groups"]:
+            for code, count in sorted(group["errors"].items()):
+                labels = self.__labels(group, code=code)
+                lines.append(f"{prefix}_errors_total{{{labels}}} {count}")
+
+        name = f"{prefix}_request_duration_seconds"
+        lines.append(f"# HELP {name} Latency of requests.")
+        lines.append(f"# TYPE {name} histogram")
+        for group in summary["groups"]:
+            total = 0
+            for bound, count in group["histogram"].items():
+                total += count
+                labels = self.__labels(group, le=bound)
+                lines.append(f"{name}_bucket{{{labels}}} {total}")
+            labels = self.__labels(group)
+            lines.append(f"{name}_sum{{{labels}}} {group['seconds']}")
+            lines.append(f"{name}_count{{{labels}}} {group['requests']}")
+
+        if summary["max_lag"] is not None:
+            lines.append(f"# HELP {prefix}_max_lag_seconds Highest reported lag.")
+            lines.append(f"# TYPE {prefix}_max_lag_seconds gauge")
+            lines.append(f"{prefix}_max_lag_seconds {summary['max_lag']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __labels(group: APIDict, **extra: str) -> str:
+        """Format the labels of a group."""
+        labels = {"action": group["action"], "module": group["module"], **extra}
+        return ",".join(
+            k + '="' + v.replace("\\", "\\\\").replace('"', '\\"') + '"'
+            for k, v in labels.items()
+        )
+
+    def write_json(self, path: FileDescriptorOrPath) -> None:
+        """Write the summary to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics to a Prometheus textfile, replacing it atomically."""
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(path + ".tmp", path)
+
+    def export_at_exit(
+        self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None
+    ) -> None:
+        """Write the JSON summary and/or the Prometheus textfile at exit."""
+        if json_path is not None:
+            atexit.register(self.write_json, json_path)
+        if prometheus_path is not None:
+            atexit.register(self.write_prometheus, prometheus_path)
+
+
+class PageCache:
+    """An on-disk cache of page content, keyed by pageid and revid.
+
+    Only the latest known revision of each page is kept. When the cached
+    text exceeds max_bytes, the least recently used pages are evicted.
+    Access times of cache hits are kept in memory and written in batches of
+    flush_every, before an eviction or on close.
+    """
+
+    def __init__(
+        self,
+        path: FileDescriptorOrPath = "pages.sqlite",
+        max_bytes: int = 2**28,
+        *,
+        flush_every: int = 1000,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.__accessed: dict[int, float] = {}
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "pageid INTEGER PRIMARY KEY, revid INTEGER NOT NULL, "
+            "timestamp TEXT, title TEXT NOT NULL, text TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.__db.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)"
+        )
+        self.__db.commit()
+        row = self.__db.execute("SELECT COALESCE(SUM(size), 0) FROM pages")
+        self.size = int(row.fetchone()[0])
+
+    def get(self, pageid: int, revid: int) -> Optional[PageSnapshot]:
+        """Get a page if its cached revision is the given one."""
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT title, text, timestamp FROM pages "
+                "WHERE pageid = ? AND revid = ?",
+                (pageid, revid),
+            ).fetchone()
+            if row is None:
+                return None
+            self.__accessed[pageid] = time.time()
+            if len(self.__accessed) >= self.flush_every:
+                self.__flush()
+                self.__db.commit()
+        return PageSnapshot(row[0], pageid, row[1], revid, row[2])
+
+    def __flush(self) -> None:
+        """Write the pending access times of cache hits."""
+        self.__db.executemany(
+            "UPDATE pages SET accessed = ? WHERE pageid = ?",
+            [(accessed, pageid) for pageid, accessed in self.__accessed.items()],
+        )
+        self.__accessed.clear()
+
+    def put(self, page: PageSnapshot) -> None:
+        """Store the revision of a page, replacing any older one."""
+        if page.pageid is None or page.revid is None or page.text is None:
+            return
+
+        size = len(page.text.encode("utf-8"))
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT size FROM pages WHERE pageid = ?", (page.pageid,)
+            ).fetchone()
+            self.size += size - (row[0] if row else 0)
+            self.__accessed.pop(page.pageid, None)
+            self.__db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    page.pageid,
+                    page.revid,
+                    page.timestamp,
+                    page.title,
+                    page.text,
+                    size,
+                    time.time(),
+                ),
+            )
+            self.__evict()
+            self.__db.commit()
+
+    def __evict(self) -> None:
+        """Remove least recently used pages until the cache fits max_bytes."""
+        if self.size > self.max_bytes:
+            self.__flush()
+        while self.size > self.max_bytes:
+            rows = self.__db.execute(
+                "SELECT pageid, size FROM pages ORDER BY accessed LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for pageid, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self.__db.execute("DELETE FROM pages WHERE pageid = ?", (pageid,))
+                self.size -= size
+
+    def close(self) -> None:
+        """Write the pending access times and close the database."""
+        with self.__lock:
+            self.__flush()
+            self.__db.commit()
+            self.__db.close()
+
+
+class JobJournal:
+    """A persistent record of the state of each page in a bulk job.
+
+    Pages are keyed by title or pageid within a named job. Each page is
+    planned, fetched, edited or failed (with a reason), so a restarted job
+    can skip the pages that were already edited without fetching them.
+    """
+
+    PLANNED = "planned"
+    FETCHED = "fetched"
+    EDITED = "edited"
+    FAILED = "failed"
+
+    def __init__(
+        self, path: FileDescriptorOrPath = "journal.sqlite", job: str = "default"
+    ) -> None:
+        self.job = job
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, "
+            "reason TEXT, updated REAL NOT NULL, PRIMARY KEY (job, key))"
+        )
+        self.__db.commit()
+
+    def plan(self, keys: Iterable[str | int]) -> None:
+        """Record pages as planned, unless they already have a state."""
+        now = time.time()
+        with self.__lock:
+            self.__db.executemany(
+                "INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, NULL, ?)",
+                [(self.job, str(key), self.PLANNED, now) for key in keys],
+            )
+            self.__db.commit()
+
+    def mark(self, key: str | int, state: str, reason: Optional[str] = None) -> None:
+        """Record the state of a page."""
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?)",
+                (self.job, str(key), state, reason, time.time()),
+            )
+            self.__db.commit()
+
+    def state(self, key: str | int) -> Optional[str]:
+        """Get the state of a page, or None if it is not in the journal."""
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT state FROM jobs WHERE job = ? AND key = ?",
+                (self.job, str(key)),
+            ).fetchone()
+        return None if row is None else str(row[0])
+
+    def keys(self, state: str) -> set[str]:
+        """Get the keys of all pages in a state."""
+        with self.__lock:
+            rows = self.__db.execute(
+                "SELECT key FROM jobs WHERE job = ? AND state = ?", (self.job, state)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def failures(self) -> dict[str, Optional[str]]:
+        """Get the failed pages and the reasons they failed."""
+        with self.__lock:
+            rows = self.__db.execute(
+                "SELECT key, reason FROM jobs WHERE job = ? AND state = ?",
+                (self.job, self.FAILED),
+            ).fetchall()
+        return dict(rows)
+
+    def counts(self) -> dict[str, int]:
+        """Count the pages in each state."""
+        with self.__lock:
+            rows = self.__db.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE job = ? GROUP BY state",
+                (self.job,),
+            ).fetchall()
+        return dict(rows)
+
+    def clear(self) -> None:
+        """Forget all pages of the job."""
+        with self.__lock:
+            self.__db.execute("DELETE FROM jobs WHERE job = ?", (self.job,))
+            self.__db.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        with self.__lock:
+            self.__db.close()
+
+
+class MwApi:
+    """A class for connecting to MediaWiki API.
+
+    Each instance has its own cookie jar, proxies and connection pool, so
+    several wikis can be used in one process. An instance may be shared by
+    threads: each thread gets its own session, while cookies and pooled
+    keep-alive connections are shared between them.
+    """
+
+    GENERATOR_PREFIXES = {
+        "categorymembers": "cm",
+        "search": "sr",
+        "backlinks": "bl",
+        "embeddedin": "ei",
+        "allpages": "ap",
+    }
 
     url = None
     lgtoken = None
     token = None
     bot = False
+    highlimits = False
 
     @staticmethod
     def __join_param(names: str | list[str], params: dict[str, str]) -> None:
@@ -83,7 +655,7 @@ class MwApi:
 
         for name in names:
             if name in params and isinstance(params[name], list):
-                params[name] = "|".join(params[name])
+                params[name] = "|".join(map(str, params[name]))
 
     @staticmethod
     def __check_page(page: Optional[str], pageid: Optional[int]) -> None:
@@ -94,8 +666,43 @@ class MwApi:
         if page is not None and pageid is not None:
             raise APIError("Both page and pageid specified", "invalidparammix")
 
+    @staticmethod
+    def page_content(page: APIDict) -> Optional[str]:
+        """Get the content of the latest revision in a page object."""
+        if "revisions" not in page:
+            return None
+        rev = page["revisions"][0]
+        if "slots" in rev:
+            return str(rev["slots"]["main"]["*"])
+        if "*" in rev:
+            return str(rev["*"])
+        raise FormatError
+
+    @staticmethod
+    def __merge_page(target: APIDict, page: APIDict) -> None:
+        """Merge a partial page object from a continued query into another."""
+        for key, value in page.items():
+            if isinstance(value, list) and isinstance(target.get(key), list):
+                target[key].extend(value)
+            else:
+                target[key] = value
+
+    @property
+    def batch_size(self) -> int:
+        """Maximum number of titles or pageids allowed in one request."""
+        return 500 if self.highlimits else 50
+
     def __init__(
-        self, url: Optional[str] = None, proxies: Optional[dict[str, str]] = None
+        self,
+        url: Optional[str] = None,
+        proxies: Optional[dict[str, str]] = None,
+        *,
+        retry: Optional[RetryPolicy] = None,
+        cache: Optional[PageCache] = None,
+        pool_size: int = 10,
+        compress: bool = True,
+        decoder: Callable[[bytes], Any] = loads,
+        skip_unchanged: bool = False,
     ) -> None:
         # Define API endpoint
         self.url = url
@@ -104,60 +711,135 @@ class MwApi:
                 "http": proxies,
                 "https": proxies,
             }
-        if proxies:
-            self.__s.proxies.update(proxies)
-
-    def post(self, params: APIDict, timeout: Optional[int | float] = None) -> APIDict:
-        """Send a POST request to the API endpoint."""
+        self.proxies = proxies or {}
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self.compress = compress
+        self.decoder = decoder
+        self.__adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.__local = threading.local()
+        self.__credentials: Optional[tuple[str, str]] = None
+        self.__session_file: Optional[str] = None
+        self.skip_unchanged = skip_unchanged
+        self.edits_skipped = 0
+        self.__lock = threading.Lock()
+        self.retry = retry or RetryPolicy()
+        self.cache = cache
+        self.pre_hooks: list[Callable[[RequestEvent], None]] = []
+        self.post_hooks: list[Callable[[RequestEvent], None]] = []
+
+    @property
+    def session(self) -> requests.Session:
+        """The session of the current thread."""
+        session = getattr(self.__local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.cookies = self.cookies
+            session.proxies.update(self.proxies)
+            if not self.compress:
+                session.headers["Accept-Encoding"] = "identity"
+            session.mount("http://", self.__adapter)
+            session.mount("https://", self.__adapter)
+            self.__local.session = session
+        return session
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.__adapter.close()
+
+    def __request(
+        self, method: str, params: APIDict, timeout: Optional[int | float]
+    ) -> APIDict:
+        """Send a request to the API endpoint, retrying as the policy allows."""
         if not self.url:
             raise TypeError("No API endpoint specified")
 
         params.update({"format": "json"})
-
-        rsp = None
-        res: APIDict = {}
-        while not rsp:
+        if self.retry.maxlag is not None:
+            params.setdefault("maxlag", self.retry.maxlag)
+
+        attempt = 0
+        while True:
+            event = RequestEvent(method, params, attempt)
+            for hook in self.pre_hooks:
+                hook(event)
             try:
-                rsp = self.__s.post(self.url, data=params, timeout=timeout)
-                rsp.encoding = rsp.apparent_encoding
-                rsp.raise_for_status()
-                res = rsp.json()
-            except requests.exceptions.Timeout:
-                pass
-            except requests.exceptions.HTTPError:
-                if rsp:
-                    print(rsp.text, file=sys.stderr)
-                else:
-                    print("No response", file=sys.stderr)
+                res, delay = self.__attempt(event, timeout)
+            finally:
+                event.elapsed = time.monotonic() - event.start
+                for hook in self.post_hooks:
+                    hook(event)
+
+            if delay is None:
+                return res
+            time.sleep(delay)
+            attempt += 1
+
+    def __attempt(
+        self, event: RequestEvent, timeout: Optional[int | float]
+    ) -> tuple[APIDict, Optional[float]]:
+        """Send a request once, returning the response or the delay before a retry."""
+        url = cast(str, self.url)
+        attempt = event.attempt
+        data = {"params" if event.method == "GET" else "data": event.params}
+        try:
+            rsp = self.session.request(event.method, url, timeout=timeout, **data)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            timed_out = isinstance(e, requests.exceptions.Timeout)
+            event.error = "timeout" if timed_out else "connection"
+            # Only a POST that never reached the server is safe to send again
+            unsent = isinstance(e, requests.exceptions.ConnectTimeout)
+            if event.method == "POST" and not unsent:
                 raise
+            if not self.retry.should_retry(attempt):
+                raise
+            event.retry = True
+            return {}, self.retry.delay(attempt)
+
+        event.status = rsp.status_code
+        event.sent = len(rsp.request.url or "") + len(rsp.request.body or "")
+        event.received = len(rsp.content)
+        if "X-Database-Lag" in rsp.headers:
+            event.lag = float(rsp.headers["X-Database-Lag"])
+
+        if event.method == "POST":
+            retryable = (
+                rsp.status_code in self.retry.post_statuses
+                and "Retry-After" in rsp.headers
+            )
+        else:
+            retryable = rsp.status_code in self.retry.statuses
+        if retryable and self.retry.should_retry(attempt):
+            event.error = str(rsp.status_code)
+            event.retry = True
+            return {}, self.retry.delay(attempt, self.retry.hint(rsp.headers))
+
+        try:
+            rsp.raise_for_status()
+        except requests.exceptions.HTTPError:
+            event.error = str(rsp.status_code)
+            print(rsp.text, file=sys.stderr)
+            raise
+
+        res: APIDict = self.decoder(rsp.content)
+        error = res.get("error", {})
+        if "lag" in error:
+            event.lag = float(error["lag"])
+        event.error = error.get("code")
+        if event.error in self.retry.codes:
+            if not self.retry.should_retry(attempt):
+                raise APIError(error["info"], event.error)
+            event.retry = True
+            return {}, self.retry.delay(attempt, self.retry.hint(rsp.headers, res))
+
+        return res, None
 
-        return res
+    def post(self, params: APIDict, timeout: Optional[int | float] = None) -> APIDict:
+        """Send a POST request to the API endpoint."""
+        return self.__request("POST", params, timeout)
 
     def get(self, params: APIDict, timeout: Optional[int | float] = None) -> APIDict:
         """Send a GET request to the API endpoint."""
-        if not self.url:
-            raise TypeError("No API endpoint specified")
-
-        params.update({"format": "json"})
-
-        rsp = None
-        res: APIDict = {}
-        while not rsp:
-            try:
-                rsp = self.__s.get(self.url, params=params, timeout=timeout)
-                rsp.encoding = rsp.apparent_encoding
-                rsp.raise_for_status()
-                res = rsp.json()
-            except requests.exceptions.Timeout:
-                pass
-            except requests.exceptions.HTTPError:
-                if rsp:
-                    print(rsp.text, file=sys.stderr)
-                else:
-                    print("No response", file=sys.stderr)
-                raise
-
-        return res
+        return self.__request("GET", params, timeout)
 
     def query(self, params: APIDict) -> APIDict:
         """Send a query request to the API endpoint."""
@@ -173,45 +855,402 @@ class MwApi:
         page: Optional[str] = None,
         *,
         pageid: Optional[int] = None,
-        redirects: bool = True
+        redirects: bool = True,
     ) -> Optional[str]:
         """Get the content of a page."""
         self.__check_page(page, pageid)
 
+        if self.cache is not None:
+            return self.page_content(self.__get_page_object(page, pageid, redirects))
+
         params = {
             "prop": "revisions",
             "titles": page,
             "pageids": pageid,
             "rvprop": "content",
             "rvslots": "*",
-            "redirects": redirects,
+            "redirects": 1 if redirects else None,
             "converttitles": 1,
         }
         res = self.query(params)
         res = list(res["query"]["pages"].values())[0]
         if "revisions" in res:
-            res = res["revisions"][0]
-            if "slots" in res:
-                return str(res["slots"]["main"]["*"])
-            if "*" in res:
-                return str(res["*"])
-            raise FormatError
+            return self.page_content(res)
         if "missing" in res:
             raise PageNotFoundError(page or pageid)
         if "invalid" in res:
             raise PageNameError(page or pageid)
         return None
 
-    def list_contribs(
+    def get_contents(
+        self,
+        titles: Optional[Iterable[str]] = None,
+        *,
+        pageids: Optional[Iterable[int]] = None,
+        redirects: bool = True,
+        strict: bool = False,
+    ) -> dict[str | int, Optional[str]]:
+        """Get the content of many pages, keyed by the requested titles or pageids.
+
+        Titles or pageids are packed into as few requests as the API allows.
+        Missing and invalid pages map to None, or raise the same errors as
+        get_content if strict is set.
+        """
+        pages = self.__get_page_objects(titles, pageids, redirects, strict)
+        return {
+            key: None if page is None else self.page_content(page)
+            for key, page in pages.items()
+        }
+
+    def get_page(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        redirects: bool = True,
+    ) -> PageSnapshot:
+        """Get the latest revision of a page, to be used as the base of an edit."""
+        self.__check_page(page, pageid)
+
+        if self.cache is not None:
+            return PageSnapshot.from_page(
+                self.__get_page_object(page, pageid, redirects)
+            )
+
+        params = {
+            "prop": "revisions",
+            "titles": page,
+            "pageids": pageid,
+            "rvprop": "ids|timestamp|sha1|content",
+            "rvslots": "*",
+            "redirects": 1 if redirects else None,
+            "converttitles": 1,
+        }
+        res = self.query(params)
+        res = list(res["query"]["pages"].values())[0]
+        if "missing" in res:
+            raise PageNotFoundError(page or pageid)
+        if "invalid" in res:
+            raise PageNameError(page or pageid)
+        return PageSnapshot.from_page(res)
+
+    def get_pages(
+        self,
+        titles: Optional[Iterable[str]] = None,
+        *,
+        pageids: Optional[Iterable[int]] = None,
+        redirects: bool = True,
+        strict: bool = False,
+    ) -> dict[str | int, Optional[PageSnapshot]]:
+        """Get the latest revision of many pages, batched like get_contents."""
+        pages = self.__get_page_objects(titles, pageids, redirects, strict)
+        return {
+            key: None
+            if page is None or "revisions" not in page
+            else PageSnapshot.from_page(page)
+            for key, page in pages.items()
+        }
+
+    def get_revisions(
+        self,
+        titles: Optional[Iterable[str]] = None,
+        *,
+        pageids: Optional[Iterable[int]] = None,
+        redirects: bool = True,
+    ) -> dict[str | int, Optional[PageSnapshot]]:
+        """Get the latest revision of many pages without their content.
+
+        The snapshots have the ids, timestamp, SHA-1 and size of the revision
+        but no text, so large pages cost no more than small ones. Missing and
+        invalid pages map to None.
+        """
+        pages = self.__get_page_objects(titles, pageids, redirects, False, False)
+        return {
+            key: None
+            if page is None or "revisions" not in page
+            else PageSnapshot.from_page(page)
+            for key, page in pages.items()
+        }
+
+    def changed_pages(
+        self, pages: Mapping[str, str], *, hashed: bool = False
+    ) -> list[str]:
+        """Find the pages whose latest revision differs from a local copy.
+
+        pages maps titles to their local text, or to its SHA-1 if hashed is
+        set. Only revision metadata is fetched, and texts are compared by
+        SHA-1 like edits with skip_unchanged. Missing pages count as changed.
+        """
+        revisions = self.get_revisions(pages)
+        changed = []
+        for title, local in pages.items():
+            rev = revisions.get(title)
+            if rev is None:
+                changed.append(title)
+            elif hashed and rev.sha1 != local.lower():
+                changed.append(title)
+            elif not hashed and not rev.unchanged_by(local):
+                changed.append(title)
+        return changed
+
+    def __get_page_object(
+        self, page: Optional[str], pageid: Optional[int], redirects: bool
+    ) -> APIDict:
+        """Fetch a page object with its latest revision through the batched path."""
+        if page is not None:
+            pages = self.__get_page_objects([page], None, redirects, True)
+        else:
+            pages = self.__get_page_objects(None, [cast(int, pageid)], redirects, True)
+        res = list(pages.values())[0]
+        if res is None:
+            raise PageNotFoundError(page or pageid)
+        return res
+
+    def __get_page_objects(
+        self,
+        titles: Optional[Iterable[str]],
+        pageids: Optional[Iterable[int]],
+        redirects: bool,
+        strict: bool,
+        content: bool = True,
+    ) -> dict[str | int, Optional[APIDict]]:
+        """Fetch page objects with their latest revision in batches."""
+        if titles is None and pageids is None:
+            raise TypeError("No titles or pageids specified")
+
+        if titles is not None and pageids is not None:
+            raise APIError("Both titles and pageids specified", "invalidparammix")
+
+        ret: dict[str | int, Optional[APIDict]] = {}
+        if titles is not None:
+            keys: list[str | int] = list(dict.fromkeys(titles))
+        else:
+            keys = list(dict.fromkeys(cast(Iterable[int], pageids)))
+
+        size = self.batch_size
+        for i in range(0, len(keys), size):
+            batch = keys[i : i + size]
+            if titles is not None:
+                pages = self.__fetch_by_titles(
+                    cast(list[str], batch), redirects, content
+                )
+            else:
+                pages = self.__fetch_by_pageids(
+                    cast(list[int], batch), redirects, content
+                )
+
+            for key, page in pages.items():
+                if page is not None and strict:
+                    if "missing" in page:
+                        raise PageNotFoundError(key)
+                    if "invalid" in page:
+                        raise PageNameError(key)
+                ret[key] = page
+
+        return ret
+
+    def __query_pages(self, params: APIDict) -> tuple[APIDict, APIDict]:
+        """Run a prop query to completion, merging pages across continuations.
+
+        Returns the merged pages keyed by pageid and the merged title mappings
+        (normalized, converted and redirects) keyed by source title.
+        """
+        pages: APIDict = {}
+        mapping: APIDict = {}
+        for res in self.__iter_responses(params):
+            query = res.get("query", {})
+            for key in ("normalized", "converted", "redirects"):
+                for item in query.get(key, []):
+                    mapping[item["from"]] = item["to"]
+            for pageid, page in query.get("pages", {}).items():
+                self.__merge_page(pages.setdefault(pageid, {}), page)
+        return pages, mapping
+
+    def __query_revisions(
+        self, params: APIDict, content: bool = True
+    ) -> tuple[APIDict, APIDict]:
+        """Query pages with info and their latest revision, like __query_pages.
+
+        With a cache, only info is queried and the content of pages whose
+        latest revision is not cached is fetched in a second request. Without
+        content, only the ids, timestamp, SHA-1 and size of revisions are.
+        """
+        if not content:
+            params.update(
+                {"prop": "revisions|info", "rvprop": "ids|timestamp|sha1|size"}
+            )
+            return self.__query_pages(params)
+
+        if self.cache is None:
+            params.update(
+                {
+                    "prop": "revisions|info",
+                    "rvprop": "ids|timestamp|sha1|content",
+                    "rvslots": "*",
+                }
+            )
+            return self.__query_pages(params)
+
+        params["prop"] = "info"
+        pages, mapping = self.__query_pages(params)
+        self.__fill_revisions(pages)
+        return pages, mapping
+
+    def __fill_revisions(self, pages: APIDict) -> None:
+        """Add the latest revision to page objects with info, using any cache."""
+        cache = self.cache
+        stale = []
+        for page in pages.values():
+            if "lastrevid" not in page:
+                continue
+            if cache is None:
+                stale.append(str(page["pageid"]))
+                continue
+            cached = cache.get(page["pageid"], page["lastrevid"])
+            if cached is None:
+                stale.append(str(page["pageid"]))
+                continue
+            page["revisions"] = [
+                {
+                    "revid": cached.revid,
+                    "timestamp": cached.timestamp,
+                    "slots": {"main": {"*": cached.text}},
+                }
+            ]
+
+        for i in range(0, len(stale), self.batch_size):
+            fetched, _ = self.__query_pages(
+                {
+                    "prop": "revisions",
+                    "pageids": "|".join(stale[i : i + self.batch_size]),
+                    "rvprop": "ids|timestamp|sha1|content",
+                    "rvslots": "*",
+                }
+            )
+            for pageid, page in fetched.items():
+                if "revisions" in page and pageid in pages:
+                    pages[pageid]["revisions"] = page["revisions"]
+                    if cache is not None:
+                        cache.put(PageSnapshot.from_page(page))
+
+    def __fetch_by_titles(
+        self, titles: list[str], redirects: bool, content: bool = True
+    ) -> dict[str | int, Optional[APIDict]]:
+        """Fetch the latest revision of each title in a single batch."""
+        pages, mapping = self.__query_revisions(
+            {
+                "titles": "|".join(titles),
+                "redirects": 1 if redirects else None,
+                "converttitles": 1,
+            },
+            content,
+        )
+        by_title = {page["title"]: page for page in pages.values() if "title" in page}
+
+        return {title: by_title.get(self.__follow(mapping, title)) for title in titles}
+
+    @staticmethod
+    def __follow(mapping: APIDict, title: str) -> str:
+        """Follow normalization, conversion and redirects to the final title."""
+        seen = {title}
+        while title in mapping and mapping[title] not in seen:
+            title = mapping[title]
+            seen.add(title)
+        return title
+
+    def __fetch_by_pageids(
+        self, pageids: list[int], redirects: bool, content: bool = True
+    ) -> dict[str | int, Optional[APIDict]]:
+        """Fetch the latest revision of each pageid in a single batch."""
+        # Redirects are resolved separately, as the API drops the source pageid
+        pages, _ = self.__query_revisions(
+            {"pageids": "|".join(str(pageid) for pageid in pageids)}, content
+        )
+
+        ret: dict[str | int, Optional[APIDict]] = {}
+        sources: dict[str, int] = {}
+        for pageid in pageids:
+            page = pages.get(str(pageid))
+            if redirects and page is not None and "redirect" in page:
+                sources[page["title"]] = pageid
+            ret[pageid] = page
+
+        if sources:
+            targets = self.__fetch_by_titles(list(sources), redirects, content)
+            for title, pageid in sources.items():
+                ret[pageid] = targets[title]
+        return ret
+
+    def iter_generator(
+        self,
+        generator: str,
+        *,
+        prop: str | list[str] = "revisions",
+        skip: Container[int] = (),
+        **kwargs: Any,
+    ) -> Iterator[APIDict]:
+        """Iterate over the pages of a generator query, with their props.
+
+        Each batch of the generator is continued until all of its props are
+        complete, so every page is yielded fully populated and only once.
+        Generator parameters are passed with their "g" prefix, e.g. gcmtitle.
+        Pages whose pageid is in skip are neither fetched nor yielded.
+        """
+        props = prop.split("|") if isinstance(prop, str) else list(prop)
+        # Revisions are filled separately unless custom ones are asked for
+        fill = "revisions" in props and "rvprop" not in kwargs
+        fill = fill and (self.cache is not None or bool(skip))
+        if fill:
+            props.remove("revisions")
+            if "info" not in props:
+                props.append("info")
+
+        params: APIDict = {"generator": generator, "prop": props}
+        if "revisions" in props:
+            params.update({"rvprop": "ids|timestamp|sha1|content", "rvslots": "*"})
+        prefix = self.GENERATOR_PREFIXES.get(generator)
+        if prefix is not None:
+            params["g" + prefix + "limit"] = self.batch_size
+        params.update(kwargs)
+        self.__join_param([k for k, v in params.items() if isinstance(v, list)], params)
+
+        pages: APIDict = {}
+        for res in self.__iter_responses(params):
+            for pageid, page in res.get("query", {}).get("pages", {}).items():
+                if page.get("pageid") not in skip:
+                    self.__merge_page(pages.setdefault(pageid, {}), page)
+
+            # Keys without the generator prefix continue props of this batch
+            cont = res.get("continue", {})
+            if any(key[0] != "g" and key != "continue" for key in cont):
+                continue
+            if fill:
+                self.__fill_revisions(pages)
+            yield from sorted(pages.values(), key=lambda p: p.get("index", 0))
+            pages = {}
+
+    def __iter_responses(
+        self, params: APIDict, recursive: bool = True
+    ) -> Iterator[APIDict]:
+        """Send a query request, following continuation, and yield each response."""
+        base = dict(params)
+        while True:
+            res = self.query(params)
+            yield res
+            if not recursive or "continue" not in res:
+                break
+            params = {**base, **res["continue"]}
+
+    def iter_contribs(
         self,
         username: Optional[str] = None,
         start: Optional[str | int] = None,
         end: Optional[str | int] = None,
         *,
         recursive: bool = True,
-        **kwargs: Any
-    ) -> list[APIDict]:
-        """Get a list of contributions of a user."""
+        **kwargs: Any,
+    ) -> Iterator[APIDict]:
+        """Iterate over contributions of a user."""
         userid = kwargs.get("userid")
         userprefix = kwargs.get("userprefix")
         if username is None and userid is None and userprefix is None:
@@ -223,25 +1262,32 @@ class MwApi:
         params.update(
             {"list": "usercontribs", "ucuser": username, "ucstart": start, "ucend": end}
         )
-        res = self.query(params)
+        for res in self.__iter_responses(params, recursive):
+            yield from res["query"]["usercontribs"]
 
-        ret: list[APIDict] = res["query"]["usercontribs"]
-        if recursive and "continue" in res:
-            kwargs["uccontinue"] = res["continue"]["uccontinue"]
-            temp = self.list_contribs(username, start, end, **kwargs)
-            ret = temp + ret if kwargs.get("ucdir") == "newer" else ret + temp
-
-        return ret
+    def list_contribs(
+        self,
+        username: Optional[str] = None,
+        start: Optional[str | int] = None,
+        end: Optional[str | int] = None,
+        *,
+        recursive: bool = True,
+        **kwargs: Any,
+    ) -> list[APIDict]:
+        """Get a list of contributions of a user."""
+        return list(
+            self.iter_contribs(username, start, end, recursive=recursive, **kwargs)
+        )
 
-    def list_category_members(
+    def iter_category_members(
         self,
         category: Optional[str] = None,
         *,
         pageid: Optional[int] = None,
         recursive: bool = True,
-        **kwargs: Any
-    ) -> list[APIDict]:
-        """Get a list of pages in a category."""
+        **kwargs: Any,
+    ) -> Iterator[APIDict]:
+        """Iterate over pages in a category."""
         self.__check_page(category, pageid)
 
         if category is not None:
@@ -257,80 +1303,200 @@ class MwApi:
             {"list": "categorymembers", "cmtitle": category, "cmpageid": pageid}
         )
         self.__join_param(["cmprop", "cmnamespace", "cmtype"], params)
-        res = self.query(params)
+        for res in self.__iter_responses(params, recursive):
+            yield from res["query"]["categorymembers"]
 
-        ret: list[APIDict] = res["query"]["categorymembers"]
-        if recursive and "continue" in res:
-            kwargs["cmcontinue"] = res["continue"]["cmcontinue"]
-            ret = ret + self.list_category_members(category, pageid=pageid, **kwargs)
+    def list_category_members(
+        self,
+        category: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any,
+    ) -> list[APIDict]:
+        """Get a list of pages in a category."""
+        return list(
+            self.iter_category_members(
+                category, pageid=pageid, recursive=recursive, **kwargs
+            )
+        )
 
+    def get_category_info(
+        self,
+        categories: Optional[Iterable[str]] = None,
+        *,
+        pageids: Optional[Iterable[int]] = None,
+    ) -> dict[str | int, APIDict]:
+        """Get the member counts of many categories, keyed like get_contents.
+
+        Each category maps to its categoryinfo: the number of pages, files
+        and subcats, and their total size. Categories without members map
+        to zero counts. Titles or pageids are packed into as few requests
+        as the API allows, so no members need to be listed.
+        """
+        if categories is None and pageids is None:
+            raise TypeError("No categories or pageids specified")
+
+        if categories is not None and pageids is not None:
+            raise APIError("Both categories and pageids specified", "invalidparammix")
+
+        if categories is not None:
+            keys: list[str | int] = list(dict.fromkeys(categories))
+        else:
+            keys = list(dict.fromkeys(cast(Iterable[int], pageids)))
+
+        empty = {"size": 0, "pages": 0, "files": 0, "subcats": 0}
+        ret: dict[str | int, APIDict] = {}
+        size = self.batch_size
+        for i in range(0, len(keys), size):
+            batch = keys[i : i + size]
+            if categories is None:
+                pages, _ = self.__query_pages(
+                    {"prop": "categoryinfo", "pageids": "|".join(map(str, batch))}
+                )
+                found = {page.get("pageid"): page for page in pages.values()}
+            else:
+                titles = {
+                    key: key
+                    if re.match(r"^(?:Category|分[类類]|cat)\:", str(key), re.I)
+                    else "Category:" + str(key)
+                    for key in batch
+                }
+                pages, mapping = self.__query_pages(
+                    {
+                        "prop": "categoryinfo",
+                        "titles": "|".join(titles.values()),
+                        "converttitles": 1,
+                    }
+                )
+                by_title = {page["title"]: page for page in pages.values()}
+                found = {
+                    key: by_title.get(self.__follow(mapping, title))
+                    for key, title in titles.items()
+                }
+            for key in batch:
+                page = found.get(key) or {}
+                ret[key] = {**empty, **page.get("categoryinfo", {})}
         return ret
 
-    def search(
+    def iter_search(
         self, query: str, *, recursive: bool = True, **kwargs: Any
-    ) -> list[APIDict]:
-        """Search for pages."""
+    ) -> Iterator[APIDict]:
+        """Iterate over search results."""
         params = {"srlimit": "max"}
         params.update(kwargs)
         params.update({"list": "search", "srsearch": query})
         self.__join_param(["srnamespace", "srinfo", "srprop"], params)
-        res = self.query(params)
-
-        ret: list[APIDict] = res["query"]["search"]
-        if recursive and "continue" in res:
-            kwargs["sroffset"] = res["continue"]["sroffset"]
-            ret = ret + self.search(query, **kwargs)
+        for res in self.__iter_responses(params, recursive):
+            yield from res["query"]["search"]
 
-        return ret
+    def search(
+        self, query: str, *, recursive: bool = True, **kwargs: Any
+    ) -> list[APIDict]:
+        """Search for pages."""
+        return list(self.iter_search(query, recursive=recursive, **kwargs))
 
-    def what_links_here(
+    def iter_what_links_here(
         self,
         page: Optional[str] = None,
         *,
         pageid: Optional[int] = None,
         recursive: bool = True,
-        **kwargs: Any
-    ) -> list[APIDict]:
-        """Get a list of pages that link to a page."""
+        **kwargs: Any,
+    ) -> Iterator[APIDict]:
+        """Iterate over pages that link to a page."""
         self.__check_page(page, pageid)
 
         params: APIDict = {"bllimit": "max"}
         params.update(kwargs)
         params.update({"list": "backlinks", "bltitle": page, "blpageid": pageid})
         self.__join_param("blnamespace", params)
-        res = self.query(params)
-        ret: list[APIDict] = res["query"]["backlinks"]
-        if recursive and "continue" in res:
-            kwargs["blcontinue"] = res["continue"]["blcontinue"]
-            ret = ret + self.what_links_here(page, pageid=pageid, **kwargs)
+        for res in self.__iter_responses(params, recursive):
+            yield from res["query"]["backlinks"]
 
-        return ret
-
-    def file_usage(
+    def what_links_here(
         self,
         page: Optional[str] = None,
         *,
         pageid: Optional[int] = None,
         recursive: bool = True,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> list[APIDict]:
-        """Get a list of pages that use a file."""
+        """Get a list of pages that link to a page."""
+        return list(
+            self.iter_what_links_here(
+                page, pageid=pageid, recursive=recursive, **kwargs
+            )
+        )
+
+    def __file_usage_responses(
+        self,
+        page: Optional[str],
+        pageid: Optional[int],
+        recursive: bool,
+        kwargs: APIDict,
+    ) -> Iterator[APIDict]:
+        """Send fileusage query requests and yield each response."""
         self.__check_page(page, pageid)
 
         params: APIDict = {"fulimit": "max"}
         params.update(kwargs)
         params.update({"prop": "fileusage", "titles": page, "pageids": pageid})
         self.__join_param(["fuprop", "funamespace", "fushow"], params)
-        res = self.query(params)
-        ret: list[APIDict] = res["query"]["pages"]
-        if recursive and "continue" in res:
-            kwargs["fucontinue"] = res["continue"]["fucontinue"]
-            ret = ret + self.file_usage(page, pageid=pageid, **kwargs)
+        return self.__iter_responses(params, recursive)
+
+    def iter_file_usage(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any,
+    ) -> Iterator[APIDict]:
+        """Iterate over pages that use a file."""
+        for res in self.__file_usage_responses(page, pageid, recursive, kwargs):
+            for item in res["query"]["pages"].values():
+                yield from item.get("fileusage", [])
 
+    def file_usage(
+        self,
+        page: Optional[str] = None,
+        *,
+        pageid: Optional[int] = None,
+        recursive: bool = True,
+        **kwargs: Any,
+    ) -> APIDict:
+        """Get the file page objects, with the pages that use each file."""
+        ret: APIDict = {}
+        for res in self.__file_usage_responses(page, pageid, recursive, kwargs):
+            for key, item in res["query"]["pages"].items():
+                if key not in ret:
+                    ret[key] = item
+                    continue
+                usage = ret[key].setdefault("fileusage", [])
+                usage.extend(item.get("fileusage", []))
         return ret
 
-    def login(self, username: str, password: str) -> None:
-        """Login to the wiki."""
+    def login(
+        self,
+        username: str,
+        password: str,
+        session_file: Optional[str] = None,
+    ) -> None:
+        """Login to the wiki.
+
+        If session_file is given, the session saved there is reused when it
+        is still logged in as username, and a new session is saved to it
+        after logging in.
+        """
+        self.__credentials = (username, password)
+        self.__session_file = session_file
+        if session_file is not None and self.load_session(session_file, username):
+            return
+        self.__login(username, password)
+
+    def __login(self, username: str, password: str) -> None:
+        """Login with a new session."""
         # Get login token
         params = {"meta": "tokens", "type": "login"}
         res = self.query(params)
@@ -349,55 +1515,171 @@ class MwApi:
             raise APIError(res["login"]["reason"], res["login"]["reason"])
 
         # Get CSRF token and bot info
-        params = {"meta": "tokens|userinfo", "uiprop": "groups"}
+        self.__update_user()
+        if self.__session_file is not None:
+            self.save_session(self.__session_file)
+
+    def __update_user(self) -> Optional[str]:
+        """Fetch the CSRF token and bot info, returning the user name or None."""
+        params = {"meta": "tokens|userinfo", "uiprop": "groups|rights"}
         res = self.query(params)
+        userinfo = res["query"]["userinfo"]
+        if "anon" in userinfo:
+            self.token = None
+            return None
         self.token = res["query"]["tokens"]["csrftoken"]
-        self.bot = "bot" in res["query"]["userinfo"]["groups"]
+        self.bot = "bot" in userinfo["groups"]
+        self.highlimits = "apihighlimits" in userinfo["rights"]
+        return cast(str, userinfo["name"])
+
+    def refresh_token(self) -> None:
+        """Fetch a new CSRF token, logging in again if the session has expired."""
+        if self.__update_user() is None:
+            if self.__credentials is None:
+                raise LoginError
+            self.__login(*self.__credentials)
+
+    def save_session(self, path: str) -> None:
+        """Save the session cookies to a file only readable by its owner."""
+        session = {
+            "url": self.url,
+            "cookies": [
+                {
+                    "name": c.name,
+                    "value": c.value,
+                    "domain": c.domain,
+                    "path": c.path,
+                    "expires": c.expires,
+                    "secure": c.secure,
+                    "rest": {"HttpOnly": None}
+                    if c.has_nonstandard_attr("HttpOnly")
+                    else {},
+                }
+                for c in self.cookies
+            ],
+        }
+        fd = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(session, f)
+        os.replace(path + ".tmp", path)
+
+    def load_session(self, path: str, username: Optional[str] = None) -> bool:
+        """Restore a saved session if it is still logged in.
+
+        The session is checked with a single userinfo query, which also
+        fetches a fresh CSRF token. If username is given, the session must
+        belong to that user.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if session.get("url") != self.url:
+            return False
+
+        for cookie in session["cookies"]:
+            self.cookies.set_cookie(requests.cookies.create_cookie(**cookie))
+        name = self.__update_user()
+        # Bot passwords log in as "User@name" but act as "User"
+        if name is None or (
+            username is not None
+            and name.replace("_", " ") != username.split("@")[0].replace("_", " ")
+        ):
+            self.cookies.clear()
+            self.token = None
+            return False
+        return True
 
     def connect_with_config(
-        self, path: FileDescriptorOrPath, site: str, login: bool = True
+        self,
+        path: FileDescriptorOrPath,
+        site: str,
+        login: bool = True,
+        session_file: Optional[str] = None,
     ) -> None:
         """Connect to a wiki using a config file."""
         with open(path, "r", encoding="utf-8") as config_file:
             config = ast.literal_eval(config_file.read())
         self.url = config[site][0]
         if login:
-            self.login(config[site][1], config[site][2])
+            self.login(config[site][1], config[site][2], session_file)
+
+    def login_with_config(
+        self,
+        path: FileDescriptorOrPath,
+        site: str,
+        session_file: Optional[str] = None,
+    ) -> None:
+        """Login to a wiki using a config file.
 
-    def login_with_config(self, path: FileDescriptorOrPath, site: str) -> None:
-        """Login to a wiki using a config file."""
-        self.connect_with_config(path, site, login=True)
+        If session_file is given, a session saved there is reused.
+        """
+        self.connect_with_config(path, site, login=True, session_file=session_file)
+
+    def __post_with_token(
+        self, params: APIDict, timeout: Optional[int | float]
+    ) -> APIDict:
+        """Send a POST request with the CSRF token, refreshing it once if needed."""
+        params["token"] = self.token
+        res = self.post(params, timeout)
+        if res.get("error", {}).get("code") == "badtoken":
+            self.refresh_token()
+            params["token"] = self.token
+            res = self.post(params, timeout)
+        return res
 
     def edit(
         self,
         page: Optional[str] = None,
         *,
         pageid: Optional[int] = None,
+        base: Optional[PageSnapshot] = None,
         suppressAbuseFilter: bool = False,
         timeout: int | float = 0.5,
-        **kwargs: Any
+        skip_unchanged: Optional[bool] = None,
+        **kwargs: Any,
     ) -> APIDict | None:
-        """Edit a page."""
+        """Edit a page.
+
+        If base is given, its revision is used to detect edit conflicts
+        instead of querying the latest revision before the edit.
+
+        If skip_unchanged is set (on the instance or in this call), an edit
+        replacing the whole text is not sent when the new text has the same
+        SHA-1 as the base revision. A nochange result is returned instead,
+        and the skipped edit is counted in edits_skipped.
+        """
         if self.token is None:
             raise LoginError
 
         self.__check_page(page, pageid)
-
-        # Retrieve a timestamp for the base revision to prevent edit conflict
-        params: APIDict = {
-            "prop": "revisions",
-            "titles": page,
-            "pageids": pageid,
-            "rvprop": "timestamp",
-            "rvslots": "*",
-        }
-        res = self.query(params)
-
-        base = list(res["query"]["pages"].values())[0]
-        if "revisions" in base:
-            base = base["revisions"][0]["timestamp"]
-        else:
-            base = None
+        if skip_unchanged is None:
+            skip_unchanged = self.skip_unchanged
+
+        if base is None:
+            # Retrieve the base revision to prevent edit conflict
+            params: APIDict = {
+                "prop": "revisions",
+                "titles": page,
+                "pageids": pageid,
+                "rvprop": "ids|timestamp|sha1",
+                "rvslots": "*",
+            }
+            res = self.query(params)
+            base = PageSnapshot.from_page(list(res["query"]["pages"].values())[0])
+
+        text = kwargs.get("text")
+        if skip_unchanged and isinstance(text, str) and "section" not in kwargs:
+            if base.unchanged_by(text):
+                with self.__lock:
+                    self.edits_skipped += 1
+                return {
+                    "result": "Success",
+                    "pageid": base.pageid,
+                    "title": base.title,
+                    "nochange": "",
+                }
 
         params = {"bot": self.bot}
         params.update(kwargs)
@@ -406,13 +1688,13 @@ class MwApi:
                 "action": "edit",
                 "title": page,
                 "pageid": pageid,
-                "token": self.token,
-                "basetimestamp": base,
+                "baserevid": base.revid,
+                "basetimestamp": base.timestamp,
                 "starttimestamp": int(time.time()),
             }
         )
         self.__join_param("tags", params)
-        res = self.post(params, timeout)
+        res = self.__post_with_token(params, timeout)
 
         if "error" in res:
             code = res["error"]["code"]
@@ -420,24 +1702,78 @@ class MwApi:
                 raise PageNotFoundError(page or pageid)
             if code == "invalidtitle":
                 raise PageNameError(page or pageid)
+            if code == "editconflict":
+                raise EditConflictError(page or pageid)
             raise APIError(res["error"]["info"], code)
 
         if res["edit"]["result"] == "Failure":
             if res["edit"]["code"] == "abusefilter-warning" and suppressAbuseFilter:
-                self.edit(page, suppressAbuseFilter=suppressAbuseFilter, **kwargs)
-            else:
-                raise APIError(res["edit"]["info"], res["edit"]["code"])
-        elif res["edit"]["result"] == "Success":
+                return self.edit(
+                    page,
+                    pageid=pageid,
+                    base=base,
+                    suppressAbuseFilter=suppressAbuseFilter,
+                    timeout=timeout,
+                    skip_unchanged=skip_unchanged,
+                    **kwargs,
+                )
+            raise APIError(res["edit"]["info"], res["edit"]["code"])
+        if res["edit"]["result"] == "Success":
             return cast(APIDict, res["edit"])
         return None
 
+    def modify(
+        self,
+        page: Optional[str] = None,
+        transform: Optional[Callable[[str], str]] = None,
+        *,
+        pageid: Optional[int] = None,
+        base: Optional[PageSnapshot] = None,
+        conflicts: int = 3,
+        transformed: Optional[str] = None,
+        **kwargs: Any,
+    ) -> APIDict | None:
+        """Replace the content of a page with a transformation of its content.
+
+        The page is fetched once (or taken from base) and saved on top of that
+        revision. On an edit conflict it is fetched again and the transform is
+        re-applied, up to the given number of times. If the text of base has
+        already been transformed, e.g. by a TransformPool, pass the result as
+        transformed to avoid transforming it again.
+        """
+        if transform is None:
+            raise TypeError("No transform specified")
+
+        if base is None:
+            base = self.get_page(page, pageid=pageid)
+
+        while True:
+            # Edit the page the snapshot was taken from, after redirects
+            target = None if base.pageid else base.title
+            try:
+                return self.edit(
+                    target,
+                    pageid=base.pageid,
+                    base=base,
+                    text=transform(base.text or "")
+                    if transformed is None
+                    else transformed,
+                    **kwargs,
+                )
+            except EditConflictError:
+                if conflicts <= 0:
+                    raise
+                conflicts -= 1
+                transformed = None
+                base = self.get_page(target, pageid=base.pageid)
+
     def replace(
         self,
         page: Optional[str] = None,
         text: Optional[str] = None,
         *,
         suppressAbuseFilter: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Replace the content of a page."""
         return self.edit(
@@ -450,7 +1786,7 @@ class MwApi:
         text: Optional[str] = None,
         *,
         suppressAbuseFilter: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Append text to a page."""
         return self.edit(
@@ -463,7 +1799,7 @@ class MwApi:
         text: Optional[str] = None,
         *,
         suppressAbuseFilter: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Prepend text to a page."""
         return self.edit(
@@ -477,7 +1813,7 @@ class MwApi:
         text: Optional[str] = None,
         *,
         suppressAbuseFilter: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Add a new section to a page."""
         return self.edit(
@@ -486,7 +1822,7 @@ class MwApi:
             sectiontitle=title,
             text=text,
             suppressAbuseFilter=suppressAbuseFilter,
-            **kwargs
+            **kwargs,
         )
 
     def replace_top(
@@ -495,7 +1831,7 @@ class MwApi:
         text: Optional[str] = None,
         *,
         suppressAbuseFilter: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Replace the top section of a page."""
         return self.edit(
@@ -503,7 +1839,7 @@ class MwApi:
             section=0,
             text=text,
             suppressAbuseFilter=suppressAbuseFilter,
-            **kwargs
+            **kwargs,
         )
 
     def move(
@@ -516,7 +1852,7 @@ class MwApi:
         talk: bool = True,
         subpages: bool = True,
         redirect: bool = False,
-        **kwargs: Any
+        **kwargs: Any,
     ) -> APIDict | None:
         """Move a page."""
         if self.token is None:
@@ -534,14 +1870,13 @@ class MwApi:
                 "fromid": beforeid,
                 "to": after,
                 "reason": reason,
-                "movetalk": talk,
-                "movesubpages": subpages,
-                "noredirect": (not redirect),
-                "token": self.token,
+                "movetalk": 1 if talk else None,
+                "movesubpages": 1 if subpages else None,
+                "noredirect": None if redirect else 1,
             }
         )
         self.__join_param("tags", params)
-        res = self.post(params, 0.5)
+        res = self.__post_with_token(params, 0.5)
 
         if "error" in res:
             code = res["error"]["code"]
@@ -551,3 +1886,269 @@ class MwApi:
                 raise PageNameError(before or beforeid)
             raise APIError(res["error"]["info"], code)
         return cast(APIDict, res["move"])
+
+
+@dataclass
+class EditJob:
+    """An edit for BulkEditor: a MwApi editing method and its arguments.
+
+    method is the name of the method to call, e.g. "replace", "append" or
+    "modify". The page is given by title or pageid, or by a base snapshot
+    in kwargs.
+    """
+
+    page: Optional[str] = None
+    method: str = "edit"
+    kwargs: APIDict = field(default_factory=dict)
+    pageid: Optional[int] = None
+
+    @property
+    def target(self) -> Optional[str | int]:
+        """The title or pageid of the edited page."""
+        if self.page is not None or self.pageid is not None:
+            return self.page if self.page is not None else self.pageid
+        base: Optional[PageSnapshot] = self.kwargs.get("base")
+        return None if base is None else base.pageid or base.title
+
+
+@dataclass
+class EditResult:
+    """The outcome of an EditJob: the API result or the exception raised."""
+
+    job: EditJob
+    result: Optional[APIDict] = None
+    error: Optional[Exception] = None
+    elapsed: float = 0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the edit succeeded."""
+        return self.error is None
+
+
+class BulkEditor:
+    """Run edit jobs concurrently on a thread pool.
+
+    At most max_rate edits per minute are started if it is set. Errors are
+    collected per job instead of aborting the batch, and are also written
+    as JSON lines to error_log if it is set. If a journal is given, jobs
+    for pages it records as edited are skipped, and the outcome of every
+    other job is recorded in it.
+
+      Typical usage example:
+
+      editor = BulkEditor(api, workers=4, max_rate=60, error_log="error.log")
+      jobs = (EditJob(page, "append", {"text": "..."}) for page in pages)
+      for result in editor.run(jobs):
+          print(result.job.target, result.ok)
+    """
+
+    def __init__(
+        self,
+        api: MwApi,
+        *,
+        workers: int = 4,
+        max_rate: Optional[float] = None,
+        error_log: Optional[str] = None,
+        journal: Optional[JobJournal] = None,
+    ) -> None:
+        self.api = api
+        self.workers = workers
+        self.max_rate = max_rate
+        self.error_log = error_log
+        self.journal = journal
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.__lock = threading.Lock()
+        self.__next_start = time.monotonic()
+
+    def __wait_turn(self) -> None:
+        """Sleep until the rate ceiling allows another edit to start."""
+        if not self.max_rate:
+            return
+        with self.__lock:
+            now = time.monotonic()
+            start = max(now, self.__next_start)
+            self.__next_start = start + 60 / self.max_rate
+        time.sleep(start - now)
+
+    def __run(self, job: EditJob) -> EditResult:
+        """Run a single job, capturing its exception."""
+        self.__wait_turn()
+        start = time.monotonic()
+        result = EditResult(job)
+        try:
+            method = getattr(self.api, job.method)
+            if job.pageid is not None:
+                result.result = method(job.page, pageid=job.pageid, **job.kwargs)
+            else:
+                result.result = method(job.page, **job.kwargs)
+        except Exception as e:  # pylint: disable=broad-except
+            result.error = e
+        result.elapsed = time.monotonic() - start
+
+        # Journal as soon as the edit is done, so that a crash cannot lose it
+        if self.journal is not None:
+            target = cast(str | int, job.target)
+            if result.error is None:
+                self.journal.mark(target, JobJournal.EDITED)
+            else:
+                reason = f"{type(result.error).__name__}: {result.error}"
+                self.journal.mark(target, JobJournal.FAILED, reason)
+        return result
+
+    def __record(self, result: EditResult) -> None:
+        """Count a result and log it if it failed."""
+        if result.ok:
+            self.succeeded += 1
+            return
+        self.failed += 1
+        if self.error_log is None:
+            return
+        error = cast(Exception, result.error)
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "page": result.job.target,
+            "method": result.job.method,
+            "error": type(error).__name__,
+            "code": getattr(error, "code", None),
+            "message": str(error),
+        }
+        with open(self.error_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def run(self, jobs: Iterable[EditJob]) -> Iterator[EditResult]:
+        """Run jobs and yield their results in the order of the jobs.
+
+        Jobs are taken from the iterable as workers become free, so it may
+        be a generator that is still fetching pages.
+        """
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending: deque[Future[EditResult]] = deque()
+            for job in jobs:
+                if self.journal is not None:
+                    target = cast(str | int, job.target)
+                    if self.journal.state(target) == JobJournal.EDITED:
+                        self.skipped += 1
+                        continue
+                    fetched = "base" in job.kwargs
+                    state = JobJournal.FETCHED if fetched else JobJournal.PLANNED
+                    self.journal.mark(target, state)
+                pending.append(pool.submit(self.__run, job))
+                while len(pending) > 2 * self.workers or (
+                    pending and pending[0].done()
+                ):
+                    result = pending.popleft().result()
+                    self.__record(result)
+                    yield result
+            while pending:
+                result = pending.popleft().result()
+                self.__record(result)
+                yield result
+
+
+@dataclass
+class TransformResult:
+    """The outcome of transforming a page: the value returned or the exception."""
+
+    page: PageSnapshot
+    result: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the transform succeeded."""
+        return self.error is None
+
+
+class TransformPool:
+    """Run a function on the text of pages in a pool of processes.
+
+    Pages are transformed while the next ones are being fetched, and CPU
+    bound transforms run in parallel. A transform that runs longer than
+    timeout seconds, e.g. a regular expression with catastrophic
+    backtracking, is killed along with its process and reported as a
+    TransformTimeoutError. The function must be picklable, e.g. defined at
+    the top level of a module. Workers are always forked rather than
+    spawned, since spawned workers would rerun the calling script, and the
+    scripts have no __main__ guard.
+
+      Typical usage example:
+
+      transforms = TransformPool(transform, timeout=60)
+      for result in transforms.map(pages):
+          if result.ok:
+              api.modify(transform=transform, transformed=result.result,
+                         base=result.page)
+    """
+
+    def __init__(
+        self,
+        func: Callable[[str], Any],
+        *,
+        workers: Optional[int] = None,
+        timeout: float = 60,
+    ) -> None:
+        self.func = func
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.context = multiprocessing.get_context("fork")
+        self.failed = 0
+        self.timed_out = 0
+
+    def __submit(
+        self, pool: Pool, page: PageSnapshot
+    ) -> tuple[PageSnapshot, AsyncResult, float]:
+        """Start transforming a page and return it with its start time."""
+        task = pool.apply_async(self.func, (page.text or "",))
+        return page, task, time.monotonic()
+
+    def map(self, pages: Iterable[PageSnapshot]) -> Iterator[TransformResult]:
+        """Transform pages and yield their results in the order of the pages.
+
+        Pages are taken from the iterable as workers become free, so it may
+        be a generator that is still fetching pages.
+        """
+        pool = self.context.Pool(self.workers)
+        pending: deque[tuple[PageSnapshot, AsyncResult, float]] = deque()
+        try:
+            for page in pages:
+                pending.append(self.__submit(pool, page))
+                while len(pending) >= self.workers or (
+                    pending and pending[0][1].ready()
+                ):
+                    result, pool = self.__collect(pool, pending)
+                    yield result
+            while pending:
+                result, pool = self.__collect(pool, pending)
+                yield result
+        finally:
+            pool.terminate()
+
+    def __collect(
+        self, pool: Pool, pending: deque[tuple[PageSnapshot, AsyncResult, float]]
+    ) -> tuple[TransformResult, Pool]:
+        """Wait for the oldest page, restarting the pool if it times out."""
+        page, task, start = pending.popleft()
+        result = TransformResult(page)
+        try:
+            result.result = task.get(max(0, start + self.timeout - time.monotonic()))
+        except multiprocessing.TimeoutError:
+            self.timed_out += 1
+            result.error = TransformTimeoutError(
+                page.pageid or page.title, self.timeout
+            )
+            # A running task cannot be cancelled, so kill every worker and
+            # start the other pending pages again on a new pool
+            pool.terminate()
+            pool = self.context.Pool(self.workers)
+            for _ in range(len(pending)):
+                pending.append(self.__submit(pool, pending.popleft()[0]))
+        except Exception as e:  # pylint: disable=broad-except
+            result.error = e
+        if result.error is not None:
+            self.failed += 1
+        result.elapsed = time.monotonic() - start
+        return result, pool
@@ -0,0 +1,25 @@
+"""Shared fixtures for the tests of the API clients."""
+import os
+import sys
+from typing import Iterator
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+
+# pylint: disable=wrong-import-position
+from fakewiki import FakeWiki, FakeWikiServer  # noqa: E402
+
+
+@pytest.fixture
+def wiki() -> FakeWiki:
+    """A small seeded wiki."""
+    return FakeWiki.seeded(100, categories=5, seed=1)
+
+
+@pytest.fixture
+def server(wiki: FakeWiki) -> Iterator[FakeWikiServer]:
+    """A fake API endpoint serving the wiki."""
+    with FakeWikiServer(wiki) as srv:
+        yield srv
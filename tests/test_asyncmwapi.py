@@ -0,0 +1,185 @@
+"""Tests of AsyncMwApi against the fake wiki."""
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+import aiohttp
+import pytest
+from fakewiki import FakeWiki, FakeWikiServer
+
+from asyncmwapi import AsyncMwApi
+from mwapi import APIError, LoginError, PageNotFoundError
+
+T = TypeVar("T")
+
+
+def run(server: FakeWikiServer, test: Callable[[AsyncMwApi], Awaitable[T]]) -> T:
+    """Run a coroutine with a client logged in to the server."""
+
+    async def main() -> T:
+        async with AsyncMwApi(server.url, concurrency=4) as api:
+            await api.login("Bot@bot", "password")
+            return await test(api)
+
+    return asyncio.run(main())
+
+
+def test_login(server: FakeWikiServer) -> None:
+    async def test(api: AsyncMwApi) -> None:
+        assert api.token is not None
+        assert api.bot
+
+    run(server, test)
+
+
+def test_login_wrong_password(server: FakeWikiServer) -> None:
+    async def main() -> None:
+        async with AsyncMwApi(server.url) as api:
+            with pytest.raises(APIError):
+                await api.login("Bot@bot", "wrong")
+            with pytest.raises(LoginError):
+                await api.append("Page 1", "text")
+
+    asyncio.run(main())
+
+
+def test_get_content(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    wiki.save("Foo", "content")
+    wiki.save("Bar", "#REDIRECT [[Foo]]")
+
+    async def test(api: AsyncMwApi) -> None:
+        assert await api.get_content("Foo") == "content"
+        assert await api.get_content("Bar") == "content"
+        assert await api.get_content("Bar", redirects=False) == "#REDIRECT [[Foo]]"
+        with pytest.raises(PageNotFoundError):
+            await api.get_content("Missing page")
+
+    run(server, test)
+
+
+def test_pagination(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    category = "追踪分类"
+    expected = sorted(page.title for page in wiki.members("Category:" + category))
+    assert len(expected) > 4
+
+    async def test(api: AsyncMwApi) -> None:
+        before = server.api.stats.get("action.query", 0)
+        members = await api.list_category_members(category, cmlimit=2)
+        assert sorted(item["title"] for item in members) == expected
+        # One request per page of two members
+        requests = server.api.stats["action.query"] - before
+        assert requests == (len(expected) + 1) // 2
+
+        first = [
+            item
+            async for item in api.iter_category_members(
+                category, cmlimit=2, recursive=False
+            )
+        ]
+        assert len(first) == 2
+
+        contribs = await api.list_contribs("Seed", uclimit=10)
+        assert len(contribs) == len(wiki.contribs)
+
+    run(server, test)
+
+
+def test_edit(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    wiki.save("Foo", "content")
+
+    async def test(api: AsyncMwApi) -> None:
+        res = await api.replace("Foo", "new content")
+        assert res is not None and res["result"] == "Success"
+        res = await api.append("Foo", " appended")
+        assert res is not None and "newrevid" in res
+        res = await api.append("Foo", "")
+        assert res is not None and "nochange" in res
+
+    run(server, test)
+    page = wiki.get("Foo")
+    assert page is not None and page.text == "new content appended"
+
+
+def test_move(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    wiki.save("Foo", "content")
+    wiki.save("Bar", "content")
+
+    async def test(api: AsyncMwApi) -> None:
+        await api.move("Foo", "Foo 2")
+        await api.move("Bar", "Bar 2", redirect=True)
+        with pytest.raises(PageNotFoundError):
+            await api.move("Missing page", "Elsewhere")
+
+    run(server, test)
+    assert wiki.get("Foo") is None
+    bar = wiki.get("Bar")
+    assert bar is not None and bar.redirect == "Bar 2"
+    moved = wiki.get("Foo 2")
+    assert moved is not None and moved.text == "content"
+
+
+def test_badtoken(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    async def test(api: AsyncMwApi) -> None:
+        # A stale token is refreshed in the same session
+        api.token = "stale+\\"
+        await api.append("Page 1", " one")
+        # An expired session logs in again
+        server.api.sessions.clear()
+        await api.append("Page 1", " two")
+        assert server.api.stats["action.login"] == 2
+
+    run(server, test)
+    page = wiki.get("Page 1")
+    assert page is not None and page.text.endswith(" one two")
+
+
+def test_concurrency_limit(server: FakeWikiServer) -> None:
+    handle = server.api.handle
+    lock = threading.Lock()
+    active = peak = 0
+
+    def tracked(*args: Any) -> Any:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        try:
+            time.sleep(0.02)
+            return handle(*args)
+        finally:
+            with lock:
+                active -= 1
+
+    async def test(api: AsyncMwApi) -> None:
+        server.api.handle = tracked  # type: ignore[method-assign]
+        titles = [f"Page {i}" for i in range(1, 30) if i % 10]
+        contents = await asyncio.gather(*(api.get_content(t) for t in titles))
+        assert all(contents)
+
+    run(server, test)
+    assert 1 < peak <= 4
+
+
+def test_post_retry(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    handle = server.api.handle
+    failures: list[tuple[int, dict[str, str]]] = []
+
+    def failing(params: dict[str, str], session: Any) -> Any:
+        if params.get("action") == "edit" and failures:
+            status, headers = failures.pop()
+            return status, {}, headers
+        return handle(params, session)
+
+    async def test(api: AsyncMwApi) -> None:
+        server.api.handle = failing  # type: ignore[method-assign]
+        # An edit that may have been saved is not sent again
+        failures.append((502, {}))
+        with pytest.raises(aiohttp.ClientResponseError):
+            await api.append("Page 1", " one")
+        failures.append((503, {"Retry-After": "0"}))
+        await api.append("Page 1", " two")
+
+    run(server, test)
+    page = wiki.get("Page 1")
+    assert page is not None and page.text.endswith("]] two")
@@ -0,0 +1,33 @@
+"""Tests of MwApi against the fake wiki."""
+from typing import Any
+
+import pytest
+import requests
+from fakewiki import FakeWiki, FakeWikiServer
+
+from mwapi import MwApi
+
+
+def test_post_retry(server: FakeWikiServer, wiki: FakeWiki) -> None:
+    handle = server.api.handle
+    failures: list[tuple[int, dict[str, str]]] = []
+
+    def failing(params: dict[str, str], session: Any) -> Any:
+        if params.get("action") == "edit" and failures:
+            status, headers = failures.pop()
+            return status, {}, headers
+        return handle(params, session)
+
+    api = MwApi(server.url)
+    api.login("Bot@bot", "password")
+    server.api.handle = failing  # type: ignore[method-assign]
+    # An edit that may have been saved is not sent again
+    failures.append((502, {}))
+    with pytest.raises(requests.exceptions.HTTPError):
+        api.append("Page 1", " one")
+    failures.append((503, {"Retry-After": "0"}))
+    api.append("Page 1", " two")
+
+    assert server.api.stats["action.edit"] == 1
+    page = wiki.get("Page 1")
+    assert page is not None and page.text.endswith("]] two")